@@ -1,155 +1,669 @@
 
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from llm_cache import get_cache
+from ai_telemetry import record_call
+from ai_backends import active_backend, backend_name
+
 # enter you file path to the file that contains your Api key or you can use an environment variable
-with open('C:/Users/Rebecca/OneDrive/Documents/Python AI/LLM (AI) Browser History Analyzer/Api_key.txt', 'r') as f:
-    # set a constant variable to the key
-    API_KEY = f.readline().strip()
+# (OPENAI_API_KEY, or OPENAI_API_KEY_FILE pointing to another key file) or the Api_key entry of config.json
+API_KEY_FILE = 'C:/Users/Rebecca/OneDrive/Documents/Python AI/LLM (AI) Browser History Analyzer/Api_key.txt'
+
+
+# ===== ERRORS =====
+# get_response keeps returning "An error occurred: ..." for old scripts, complete() and
+# ResilientClient raise these instead so error text never ends up in saved material.
+class AIError(Exception):
+    """Raised when a model did not return a response."""
+    def __init__(self, message, model=None, cause=None):
+        super().__init__(message)
+        self.model = model
+        self.cause = cause
+
+
+class TransientAIError(AIError):
+    """A failure that may go away when retried (rate limit, timeout, connection problem, server error)."""
+
+
+class PermanentAIError(AIError):
+    """A failure that retrying will not fix (invalid key, bad request, prompt too long, empty response)."""
+
+
+class CircuitOpenError(AIError):
+    """Raised instead of calling a model that failed repeatedly and has no fallback."""
+
+
+# names of the openai exceptions (and builtins) that are worth retrying
+TRANSIENT_ERROR_NAMES = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+                         "ServiceUnavailableError", "Timeout", "TimeoutError", "ConnectionError"}
+
+
+def _classify_error(error, model):
+    """Wrap an exception raised by the API call in the matching AIError subclass."""
+    if isinstance(error, AIError):
+        return error
+    status = getattr(error, "status_code", None)
+    transient = type(error).__name__ in TRANSIENT_ERROR_NAMES or (status is not None and (status == 429 or status >= 500))
+    error_class = TransientAIError if transient else PermanentAIError
+    return error_class(f"{model}: {error}", model=model, cause=error)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient failures.
+
+    Attributes:
+        max_attempts (int): Number of tries including the first one
+        base_delay (float): Upper bound of the first wait in seconds (doubled on every retry)
+        max_delay (float): Largest wait in seconds
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Return a random wait before retry number attempt + 1."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, function, model):
+        """
+        Call function, retrying transient failures.
+
+        Raises:
+            TransientAIError: If every attempt failed with a transient error
+            PermanentAIError: On the first failure that is not transient
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return function()
+            except Exception as e:
+                error = _classify_error(e, model)
+                if not isinstance(error, TransientAIError) or attempt == self.max_attempts - 1:
+                    raise error from e
+                time.sleep(self.delay(attempt))
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+# ===== CREDENTIALS AND CONNECTION =====
+# Nothing is read or connected when this module is imported: the key is loaded and the HTTP
+# client created the first time a model is actually called, and then shared by every client.
+_api_key = None
+_openai_clients = {}
+_connection_lock = threading.Lock()
+
+
+def load_api_key():
+    """
+    Return the OpenAI API key, reading it on the first call.
+
+    Looks in order at the OPENAI_API_KEY environment variable, the Api_key entry of
+    config.json and the key file (OPENAI_API_KEY_FILE or API_KEY_FILE).
+
+    Raises:
+        PermanentAIError: If no key was found
+    """
+    global _api_key
+    if _api_key is None:
+        key = os.environ.get("OPENAI_API_KEY", "").strip()
+        if not key and os.path.exists("config.json"):
+            try:
+                with open("config.json", "r") as f:
+                    key = str(json.load(f).get("Api_key", "")).strip()
+            except ValueError:
+                key = ""
+        key_file = os.environ.get("OPENAI_API_KEY_FILE", API_KEY_FILE)
+        if not key and os.path.exists(key_file):
+            with open(key_file, "r") as f:
+                key = f.readline().strip()
+        if not key:
+            raise PermanentAIError("No OpenAI API key found. Set OPENAI_API_KEY, the Api_key entry of config.json "
+                                   f"or put the key in {key_file}.")
+        _api_key = key
+    return _api_key
+
+
+def get_openai_client(api_key=None):
+    """
+    Return the shared OpenAI client for an API key (the configured key by default).
+
+    The client keeps its HTTP connections alive, so calls after the first one skip the
+    connection and TLS setup.
+    """
+    api_key = api_key or load_api_key()
+    with _connection_lock:
+        if api_key not in _openai_clients:
+            import httpx
+            import openai
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=300),
+                timeout=httpx.Timeout(600.0, connect=10.0))
+            _openai_clients[api_key] = openai.OpenAI(api_key=api_key, http_client=http_client)
+        return _openai_clients[api_key]
+
+
+def get_chat_client(api_key=None):
+    """
+    Return the client that answers chat completions: the shared OpenAI client, or the
+    local stand-in selected with SMR_LLM_BACKEND / ai_backends.set_backend (see ai_backends.py).
+    """
+    backend = active_backend()
+    return backend if backend is not None else get_openai_client(api_key)
+
+
+def _backend_key():
+    # responses of a stand-in backend must never be served to the real one from the response cache
+    name = backend_name()
+    return {} if name == "openai" else {"backend": name}
+
+
+def _stream_parts(response, model, call_site, started):
+    """
+    Yield the text parts of a streamed chat completion and return the complete (stripped) response.
+
+    The call is recorded in the telemetry once the stream ends (the last chunk carries the token usage).
+
+    Raises:
+        AIError: If the stream breaks off or contains no text
+    """
+    parts = []
+    usage = None
+    first_token_seconds = None
+    try:
+        for chunk in response:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - started
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        answer = "".join(parts).strip()
+        if not answer:
+            raise PermanentAIError(f"{model}: empty response", model=model)
+    except Exception as e:
+        error = _classify_error(e, model)
+        record_call(call_site, model, started, usage, error=type(error).__name__, first_token_seconds=first_token_seconds)
+        raise error from e
+    record_call(call_site, model, started, usage, first_token_seconds=first_token_seconds)
+    return answer
+
+
+class BaseChatClient:
+    """
+    The request path shared by the OpenAI clients: response cache, retries, telemetry and streaming.
+
+    Subclasses only decide which model parameters are sent (_parameters) and which settings,
+    besides the model, system role and prompt, make a cached response reusable (_cache_parameters).
+
+    Attributes:
+        api_key (str): The API key for authenticating with the OpenAI API (None uses the configured key).
+        model_name (str): The name of the model to use for generating responses.
+        system_role_content (str): The content for the system role in the conversation.
+        use_cache (bool): Whether responses are looked up in / saved to the response cache by default.
+        retry_policy (RetryPolicy): How transient failures are retried.
+
+    Methods:
+        complete(prompt: str, use_cache: bool = None) -> str:
+            Generates a response, retrying transient failures and raising AIError if there is none.
+        stream(prompt: str, use_cache: bool = None) -> Iterator[str]:
+            Yields the response piece by piece while it is generated.
+        get_response(prompt: str, use_cache: bool = None) -> str:
+            Generates a response from the OpenAI API based on the given prompt.
+    """
+
+    def __init__(self, api_key, model_name, system_role_content, use_cache, retry_policy):
+        self.api_key = api_key
+        # the OpenAI client is looked up on first use (see the client property)
+        self._client = None
+        self.model_name = model_name
+        self.system_role_content = system_role_content
+        self.use_cache = use_cache
+        self.retry_policy = retry_policy
+
+    def _parameters(self):
+        """Model parameters sent with every request (besides the model, the messages and stream)."""
+        return {}
+
+    def _cache_parameters(self):
+        """Settings that change the response, part of the response cache key."""
+        return {}
+
+    def complete(self, prompt, use_cache=None, call_site=None):
+        """
+        Generates a response from the OpenAI API based on the given prompt.
+
+        Args:
+            prompt (str): The prompt to send to the OpenAI API.
+            use_cache (bool): Override the client's use_cache setting for this call
+                              (e.g. False when a fresh answer is wanted for the same prompt).
+            call_site (str): Name of the feature making the call, recorded with its latency and tokens (see ai_telemetry.py).
+
+        Returns:
+            str: The response generated by the OpenAI API.
+
+        Raises:
+            AIError: If no response could be generated (transient failures are retried first).
+        """
+        use_cache = self.use_cache if use_cache is None else use_cache
+        started = time.perf_counter()
+        if use_cache:
+            cached = get_cache().get(self._cache_key(prompt))
+            if cached is not None:
+                record_call(call_site, self.model_name, started, cached=True)
+                return cached
+        try:
+            response = self.retry_policy.call(lambda: self._create(prompt), self.model_name)
+            answer = (response.choices[0].message.content or "").strip()
+            if not answer:
+                raise PermanentAIError(f"{self.model_name}: empty response", model=self.model_name)
+        except AIError as e:
+            record_call(call_site, self.model_name, started, error=type(e).__name__)
+            raise
+        record_call(call_site, self.model_name, started, getattr(response, "usage", None))
+        if use_cache:
+            get_cache().put(self._cache_key(prompt), answer)
+        return answer
+
+    def stream(self, prompt, use_cache=None, call_site=None):
+        """
+        Generates a response and yields it piece by piece while the model is still writing it.
+
+        Long high-verbosity responses take tens of seconds, streaming shows the first words right away.
+
+        Args:
+            prompt (str): The prompt to send to the OpenAI API.
+            use_cache (bool): Override the client's use_cache setting for this call.
+                              A cached response is yielded in one piece.
+            call_site (str): Name of the feature making the call (see ai_telemetry.py).
+
+        Yields:
+            str: The next part of the response.
+
+        Raises:
+            AIError: If no response could be generated (failures before the first part are retried).
+        """
+        use_cache = self.use_cache if use_cache is None else use_cache
+        started = time.perf_counter()
+        if use_cache:
+            cached = get_cache().get(self._cache_key(prompt))
+            if cached is not None:
+                record_call(call_site, self.model_name, started, cached=True)
+                yield cached
+                return
+        try:
+            response = self.retry_policy.call(lambda: self._create(prompt, stream=True), self.model_name)
+        except AIError as e:
+            record_call(call_site, self.model_name, started, error=type(e).__name__)
+            raise
+        answer = yield from _stream_parts(response, self.model_name, call_site, started)
+        if use_cache:
+            get_cache().put(self._cache_key(prompt), answer)
+
+    @property
+    def client(self):
+        """The shared OpenAI client (created on the first call) or the selected local backend."""
+        return self._client or get_chat_client(self.api_key)
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def _create(self, prompt, stream=False):
+        return self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": self.system_role_content},
+                    {"role": "user", "content": prompt}
+                ],
+                stream=stream,
+                # the last streamed chunk then carries the token usage for the telemetry
+                **({"stream_options": {"include_usage": True}} if stream else {}),
+                **self._parameters()
+            )
+
+    def _cache_key(self, prompt):
+        return get_cache().make_key(model=self.model_name, system=self.system_role_content, prompt=prompt,
+                                    **self._cache_parameters(), **_backend_key())
+
+    def get_response(self, prompt, use_cache=None, call_site=None):
+        """
+        Generates a response from the OpenAI API based on the given prompt.
+
+        Args:
+            prompt (str): The prompt to send to the OpenAI API.
+            use_cache (bool): Override the client's use_cache setting for this call.
+            call_site (str): Name of the feature making the call (see ai_telemetry.py).
+
+        Returns:
+            str: The response generated by the OpenAI API, or "An error occurred: ..." if there is none.
+        """
+        try:
+            return self.complete(prompt, use_cache, call_site)
+        except AIError as e:
+            return f"An error occurred: {str(e)}"
 
 
 # Class for interacting with the OpenAI models that are ideal for general purpose tasks
-class OpenAIClient:
+class OpenAIClient(BaseChatClient):
     """
     A client for interacting with the OpenAI API.
 
     Attributes:
-        api_key (str): The API key for authenticating with the OpenAI API.
+        api_key (str): The API key for authenticating with the OpenAI API (None uses the configured key).
         model_name (str): The name of the model to use for generating responses.
         max_tokens (int): The maximum number of tokens to generate in the response.
         system_role_content (str): The content for the system role in the conversation.
         temperature (float): The randomness of the model's responses.
         top_p (float): The cumulative probability threshold for top-p sampling.
+        use_cache (bool): Whether responses are looked up in / saved to the response cache by default.
 
     Methods:
-        get_response(prompt: str) -> str:
-            Generates a response from the OpenAI API based on the given prompt.
+        See BaseChatClient (complete, stream, get_response).
     """
  
-    def __init__(self, api_key=API_KEY, 
+    def __init__(self, api_key=None, 
                  model_name="gpt-5-chat-latest", 
                  # max_tokens=4096, 
                  system_role_content="You are a helpful assistant.", 
                  temperature=.4, 
-                 top_p=.7):
+                 top_p=.7,
+                 use_cache=True,
+                 retry_policy=DEFAULT_RETRY_POLICY):
         """
         Initializes the OpenAIClient with the given parameters.
 
         Args:
-            api_key (str): The API key for authenticating with the OpenAI API.
+            api_key (str): The API key for authenticating with the OpenAI API. Defaults to the key found by load_api_key.
             model_name (str): The name of the model to use for generating responses. Defaults to "gpt-4o-mini".
             max_tokens (int): The maximum number of tokens to generate in the response. Defaults to 4096.
             system_role_content (str): The content for the system role in the conversation. Defaults to "You are a helpful assistant.".
             temperature (float): The randomness of the model's responses. We chose a default of 0.3
             top_p (float): The cumulative probability threshold for top-p sampling. We chosse a default of 0.6
+            use_cache (bool): Answer repeated prompts from the on-disk response cache (see llm_cache.py). Defaults to True.
+            retry_policy (RetryPolicy): How transient failures are retried.
         """
-        import openai
-        openai.api_key = api_key
-        self.client = openai
-        self.model_name = model_name
+        super().__init__(api_key, model_name, system_role_content, use_cache, retry_policy)
         # self.max_tokens = max_tokens
-        self.system_role_content = system_role_content
         self.temperature = temperature
         self.top_p = top_p
 
-    def get_response(self, prompt):
-        """
-        Generates a response from the OpenAI API based on the given prompt.
+    def _parameters(self):
+        # max_tokens=self.max_tokens,
+        return {"temperature": self.temperature, "top_p": self.top_p}
 
-        Args:
-            prompt (str): The prompt to send to the OpenAI API.
-
-        Returns:
-            str: The response generated by the OpenAI API.
-        """
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": self.system_role_content},
-                    {"role": "user", "content": prompt}
-                ],
-                # max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                top_p=self.top_p
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"An error occurred: {str(e)}"
+    def _cache_parameters(self):
+        return {"temperature": self.temperature, "top_p": self.top_p}
             
 
 # Class for interacting with the OpenAI models that are ideal for more complex reasoning tasks
-class Reasoning_OpenAIClient:
+class Reasoning_OpenAIClient(BaseChatClient):
     """
     A client for interacting with the OpenAI API.
 
     Attributes:
-        api_key (str): The API key for authenticating with the OpenAI API.
+        api_key (str): The API key for authenticating with the OpenAI API (None uses the configured key).
         model_name (str): The name of the model to use for generating responses.
         reasoning (str): The level of reasoning capability ("low", "medium", or "high").
         system_role_content (str): The content for the system role in the conversation.
+        use_cache (bool): Whether responses are looked up in / saved to the response cache by default.
 
     Notes:
         - The model has a context window of 128K tokens
         - Can generate up to 16.4K tokens in output
         - Default max_completion_tokens is 512 if not specified
         - Token usage includes both visible output tokens and reasoning tokens
+        - The response length and reasoning depth are automatically managed based on the reasoning
+          level, the model's default max_completion_tokens and the available context window
     """
  
-    def __init__(self, api_key=API_KEY, 
+    def __init__(self, api_key=None, 
                  model_name="gpt-5.4", 
                  reasoning = "medium",
                  verbosity = "medium",
-                 system_role_content="You are a helpful assistant." 
+                 system_role_content="You are a helpful assistant.",
+                 use_cache=True,
+                 retry_policy=DEFAULT_RETRY_POLICY
                  ):
         """
         Initializes the OpenAIClient with the given parameters.
 
         Args:
-            api_key (str): The API key for authenticating with the OpenAI API.
+            api_key (str): The API key for authenticating with the OpenAI API. Defaults to the key found by load_api_key.
             model_name (str): The name of the model to use for generating responses. Defaults to "gpt-o4-mini".
             reasoning (str): The level of reasoning capability ("low", "medium", or "high"). Defaults to "medium".
                            Lower levels use fewer tokens for reasoning but may be less thorough.
             system_role_content (str): The content for the system role in the conversation. Defaults to "You are a helpful assistant.".
+            use_cache (bool): Answer repeated prompts from the on-disk response cache (see llm_cache.py). Defaults to True.
+            retry_policy (RetryPolicy): How transient failures are retried.
 
         Note:
             The model will automatically manage token usage for both output and internal reasoning.
             You can control reasoning token usage through the reasoning parameter.
         """
-        import openai
-        openai.api_key = api_key
-        self.client = openai
-        self.model_name = model_name
+        super().__init__(api_key, model_name, system_role_content, use_cache, retry_policy)
         self.reasoning = reasoning
         self.verbosity = verbosity
-        self.system_role_content = system_role_content
 
-    def get_response(self, prompt):
+    def _cache_parameters(self):
+        return {"reasoning": self.reasoning, "verbosity": self.verbosity}
+
+
+# ===== CIRCUIT BREAKER AND FALLBACK =====
+class CircuitBreaker:
+    """
+    Tracks the health of a model and stops calling it while it keeps failing.
+
+    After failure_threshold failures in a row the circuit opens and calls go to the fallback.
+    Once reset_timeout seconds have passed one call is let through again (half open); a success
+    closes the circuit, a failure opens it for another reset_timeout.
+
+    Attributes:
+        failure_threshold (int): Failures in a row that open the circuit
+        reset_timeout (float): Seconds the circuit stays open before the model is tried again
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """"closed" (healthy), "open" (skipped) or "half-open" (next call is a trial)."""
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        """Return True if the model may be called now."""
+        with self._lock:
+            if self.state == "half-open":
+                # let one trial call through and keep the others on the fallback until it reports back
+                self.opened_at = time.monotonic()
+                return True
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# one breaker per model, shared by every client in the session
+_breakers = {}
+_breakers_guard = threading.Lock()
+
+
+def get_breaker(model_name):
+    """Return the shared CircuitBreaker of a model."""
+    with _breakers_guard:
+        return _breakers.setdefault(model_name, CircuitBreaker())
+
+
+# threads for hedged requests (the losing call finishes in the background and still fills the cache)
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-hedge")
+
+
+class ResilientClient:
+    """
+    A primary model with a fallback model behind a circuit breaker.
+
+    Replaces the "call the model, check for 'An error occurred', call the backup" pattern:
+    transient failures are retried by the clients themselves, a failed call goes to the
+    fallback, and while the primary's circuit is open it is skipped altogether.
+
+    With hedge_after set, a primary call that has not answered after that many seconds is
+    raced against the fallback and the first response wins, which bounds the wait when the
+    provider is slow.
+
+    Attributes:
+        primary (OpenAIClient | Reasoning_OpenAIClient): The preferred model
+        fallback (OpenAIClient | Reasoning_OpenAIClient): Used when the primary fails or is unhealthy (optional)
+        breaker (CircuitBreaker): Health of the primary (shared by all clients of the same model)
+        hedge_after (float): Seconds before the fallback is raced against a slow primary (None disables hedging)
+    """
+
+    def __init__(self, primary, fallback=None, breaker=None, hedge_after=None):
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker or get_breaker(primary.model_name)
+        self.hedge_after = hedge_after
+
+    def get_response(self, prompt, use_cache=None, call_site=None):
         """
-        Generates a response from the OpenAI API based on the given prompt.
+        Generate a response with the primary model, or the fallback if the primary is unavailable.
 
         Args:
-            prompt (str): The prompt to send to the OpenAI API.
+            prompt (str): The prompt to send
+            use_cache (bool): Override the clients' use_cache setting for this call
+            call_site (str): Name of the feature making the call (see ai_telemetry.py)
 
         Returns:
-            str: The response generated by the OpenAI API.
+            str: The response
 
-        Note:
-            The response length and reasoning depth are automatically managed based on:
-            - The reasoning level set during initialization ("low", "medium", "high")
-            - The model's default max_completion_tokens (512)
-            - Available context window (128K tokens)
+        Raises:
+            AIError: If neither model returned a response
         """
+        if not self.breaker.allow():
+            if self.fallback is None:
+                raise CircuitOpenError(f"{self.primary.model_name} is unavailable", model=self.primary.model_name)
+            return self.fallback.complete(prompt, use_cache, call_site)
+        if self.hedge_after is not None and self.fallback is not None:
+            return self._hedged_response(prompt, use_cache, call_site)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": self.system_role_content},
-                    {"role": "user", "content": prompt}
-                ]
-              
+            answer = self.primary.complete(prompt, use_cache, call_site)
+        except AIError:
+            self.breaker.record_failure()
+            if self.fallback is None:
+                raise
+            return self.fallback.complete(prompt, use_cache, call_site)
+        self.breaker.record_success()
+        return answer
+
+    def stream(self, prompt, use_cache=None, call_site=None):
+        """
+        Stream a response from the primary model, or from the fallback if the primary is unavailable.
+
+        The fallback only takes over if the primary fails before its first part (a response
+        cannot be switched to another model halfway). Streams are not hedged.
+
+        Yields:
+            str: The next part of the response
+
+        Raises:
+            AIError: If neither model returned a response, or the stream broke off
+        """
+        if not self.breaker.allow():
+            if self.fallback is None:
+                raise CircuitOpenError(f"{self.primary.model_name} is unavailable", model=self.primary.model_name)
+            yield from self.fallback.stream(prompt, use_cache, call_site)
+            return
+        started = False
+        try:
+            for part in self.primary.stream(prompt, use_cache, call_site):
+                started = True
+                yield part
+        except AIError:
+            self.breaker.record_failure()
+            if started or self.fallback is None:
+                raise
+            yield from self.fallback.stream(prompt, use_cache, call_site)
+            return
+        self.breaker.record_success()
+
+    def _hedged_response(self, prompt, use_cache, call_site):
+        """Start the primary, add the fallback after hedge_after seconds and return the first response."""
+        primary = _hedge_executor.submit(self.primary.complete, prompt, use_cache, call_site)
+        pending = {primary}
+        done, _ = wait(pending, timeout=self.hedge_after)
+        fallback_started = False
+        if not done:
+            pending.add(_hedge_executor.submit(self.fallback.complete, prompt, use_cache, call_site))
+            fallback_started = True
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    answer = future.result()
+                except AIError as e:
+                    error = e
+                    if future is primary:
+                        self.breaker.record_failure()
+                        # the primary failed quickly, before the race started
+                        if not fallback_started:
+                            pending.add(_hedge_executor.submit(self.fallback.complete, prompt, use_cache, call_site))
+                            fallback_started = True
+                    continue
+                if future is primary:
+                    self.breaker.record_success()
+                return answer
+        raise error
+
+
+# ===== CLIENT REGISTRY =====
+# one client per configuration for the whole process, so call sites that run many times
+# (queries, summaries, quizzes) reuse the same client instead of building a new one per call
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_client(client_class=None, **settings):
+    """
+    Return the shared client of a class with the given settings, creating it on first use.
+
+    Args:
+        client_class (type): OpenAIClient (default) or Reasoning_OpenAIClient
+        **settings: Arguments for the client's constructor (model_name, system_role_content, ...)
+
+    Returns:
+        OpenAIClient | Reasoning_OpenAIClient: The shared client
+
+    Example:
+        >>> fast = get_client(model_name="gpt-4.1-mini", temperature=0.2, top_p=0.5)
+    """
+    client_class = client_class or OpenAIClient
+    key = (client_class, tuple(sorted(settings.items(), key=lambda item: item[0])))
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = client_class(**settings)
+        return _registry[key]
 
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"An error occurred: {str(e)}"
         
 # IMPORTANT:
 # Docs for the new Gpt-5.4 model can be found here with all the available parameters:
@@ -1,30 +1,51 @@
 
 # AI_text_to_query_converter.py
-def natural_language_to_query(natural_language, display_output=True, purpose="query"):
+def natural_language_to_query(natural_language, display_output=True, purpose="query", context_tokens=None,
+                              fuzzy_cache=False):
     
     # purpose param is necessary if the output query is to be displayed to the user
+    # context_tokens limits the size of the data profile in the prompt (query_context.DEFAULT_TOKEN_BUDGET by default)
+    # fuzzy_cache also reuses the query of a saved question with nearly the same words (see query_cache.py)
 
     from IPython.display import display, clear_output, Markdown
-    from AI_class import OpenAIClient, Reasoning_OpenAIClient
-    import query_runner
+    from AI_class import Reasoning_OpenAIClient, ResilientClient, AIError, get_client
     import time
-    import os
+    from query_context import build_context, DEFAULT_TOKEN_BUDGET
+    from query_cache import get_query_cache, vocabulary_version
+    from duck_database_runner import QueryError
+    
     
+    # the same (or an equivalent) question asked before is answered with its saved query
+    cache = get_query_cache()
+    try:
+        vocabulary = vocabulary_version()
+    except QueryError as e:
+        # the learning history could not be read (e.g. the database is locked by another notebook)
+        display(Markdown(str(e)))
+        return
+    cached_query = cache.get(natural_language, purpose, vocabulary, fuzzy=fuzzy_cache)
+    if cached_query is not None:
+        display(Markdown(f"**Your entered:** {natural_language}"))
+        print("Using the saved query for this question...\n")
+        time.sleep(1)
+        clear_output(wait=True)
+        return _run_generated_query(cached_query, display_output)
     
-    ai = Reasoning_OpenAIClient()
-    backup_ai = OpenAIClient(model_name="gpt-4.1-mini")
+    # reasoning model first, the backup model answers if it fails or is unhealthy
+    ai = ResilientClient(get_client(Reasoning_OpenAIClient), get_client(model_name="gpt-4.1-mini"))
     
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    query_output_file = os.path.join(BASE_DIR, "query_output.csv")
     display(Markdown(f"**Your entered:** {natural_language}"))
     print('Fetching context data from the database...\n')
     time.sleep(1)
     clear_output(wait=True)
     
-    # Get distinct subjects and topics for context to feed the model but do not display it to the user 
-    query_runner.run_query("select distinct subject, topic, Date FROM learned_material where subject is not null;", display_output=False)
-    with open(query_output_file, 'r') as f:
-        data = f.read()
+    # Compact profile of the subjects, topics and dates for context to feed the model but do not display it to the user
+    # (bounded by the token budget and cached until the data changes, instead of every distinct row)
+    try:
+        data = build_context(token_budget=context_tokens or DEFAULT_TOKEN_BUDGET)
+    except QueryError as e:
+        display(Markdown(str(e)))
+        return
 
     if purpose == "summary":
         context = f"""I have a spaced memory review program/app where users submit material or have an AI generate material for them to learn and review over time. 
@@ -129,22 +150,35 @@ def natural_language_to_query(natural_language, display_output=True, purpose="qu
     
     print("Generating query...\n")
     clear_output(wait=True)
-    z = ai.get_response(f"""Given this context: {context}
-                                    Here is the natural language question from the user:
-                                    {natural_language}
-                                    """)
-    
-    if z.startswith("An error occurred"):
-        z = backup_ai.get_response(f"""Given this context: {context}
+    try:
+        # the response cache is skipped: a query that failed (or "Invalid Query.") would be replayed on every
+        # retry of the question, the queries that ran successfully are kept in the query cache instead
+        z = ai.get_response(f"""Given this context: {context}
                                     Here is the natural language question from the user:
                                     {natural_language}
-                                    """)
+                                    """, use_cache=False, call_site="nl_to_sql")
+    except AIError as e:
+        display(Markdown(f"### **The query could not be generated.**\n\n{e}"))
+        return
     # optional to see the query generated
     #display(Markdown(f"__Your question:__ {natural_language}"))
     if z == "Invalid Query.":
         error_message = "### **The system was unable to generate a valid SQL query based on your input.**\n\nPlease try rephrasing your question or providing more specific details about the data you are looking for."
         display(Markdown(error_message))
         return
+    df = _run_generated_query(z, display_output)
+    # only queries that ran are saved for the next time the question is asked
+    if df is not None:
+        cache.put(natural_language, purpose, vocabulary, z)
+    return df
+
+
+def _run_generated_query(z, display_output):
+    """Show the generated SQL query and run it (None if the query failed)."""
+    from IPython.display import display, clear_output, Markdown
+    import query_runner
+    import time
+    
     print(f"Generated SQL query: \n")
     display(Markdown(f"```sql\n{z}\n```"))
     
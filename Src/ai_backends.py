@@ -0,0 +1,387 @@
+"""
+ai_backends.py
+==============
+Stand-ins for the OpenAI API, to measure and test the AI-dependent paths offline.
+
+The clients in AI_class.py only use `client.chat.completions.create(...)`.
+FakeChatClient provides that call in-process with configurable latency,
+failure injection and scripted responses, and MockChatServer serves the same
+fake over HTTP with the chat-completions protocol, so the real openai package
+(connection pool, streaming, error handling) is exercised as well.
+
+Selecting a backend (nothing changes when none of these is set):
+
+    SMR_LLM_BACKEND=fake          every client uses the in-process fake
+    SMR_FAKE_LLM=fake_llm.json    settings of the fake (optional, see FakeChatClient.from_config)
+
+    python ai_backends.py serve --port 8765 --config fake_llm.json
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 and OPENAI_API_KEY=local
+                                  the normal OpenAI backend talks to the local mock server
+
+Example settings file:
+
+    {
+        "latency": {"distribution": "lognormal", "mean": 1.5, "spread": 0.4},
+        "token_delay": 0.005,
+        "failure_rate": 0.05,
+        "failure": "RateLimitError",
+        "seed": 7,
+        "responses": [
+            {"pattern": "SQL query", "response": "SELECT Subject, Topic, FilePath FROM learned_material"},
+            {"pattern": "spelling", "response": ["Python", "Lists"]}
+        ],
+        "models": {"gpt-5.4": {"failure_rate": 1.0, "failure": "InternalServerError"}}
+    }
+"""
+
+import itertools
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+# Environment variables that select the backend
+BACKEND_VARIABLE = "SMR_LLM_BACKEND"
+FAKE_CONFIG_VARIABLE = "SMR_FAKE_LLM"
+
+
+# ===== INJECTED ERRORS =====
+# Named like the openai exceptions (with the same status codes) so AI_class classifies them the same way
+class FakeAPIError(Exception):
+    status_code = 500
+
+
+class RateLimitError(FakeAPIError):
+    status_code = 429
+
+
+class APITimeoutError(FakeAPIError):
+    status_code = 408
+
+
+class APIConnectionError(FakeAPIError):
+    status_code = 503
+
+
+class InternalServerError(FakeAPIError):
+    status_code = 500
+
+
+class BadRequestError(FakeAPIError):
+    status_code = 400
+
+
+INJECTABLE_ERRORS = {error.__name__: error for error in
+                     (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError, BadRequestError)}
+
+
+class Latency:
+    """
+    A latency distribution in seconds.
+
+    Attributes:
+        distribution (str): "fixed", "uniform" (mean +/- spread), "normal" (standard deviation spread)
+                            or "lognormal" (mean is the median, spread the sigma of the log)
+        mean (float): Typical latency
+        spread (float): Width of the distribution
+    """
+
+    def __init__(self, distribution="fixed", mean=0.0, spread=0.0):
+        if distribution not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.distribution = distribution
+        self.mean = mean
+        self.spread = spread
+
+    def sample(self, rng):
+        if self.distribution == "uniform":
+            value = rng.uniform(self.mean - self.spread, self.mean + self.spread)
+        elif self.distribution == "normal":
+            value = rng.gauss(self.mean, self.spread)
+        elif self.distribution == "lognormal":
+            value = self.mean * math.exp(rng.gauss(0, self.spread))
+        else:
+            value = self.mean
+        return max(0.0, value)
+
+
+def _count_tokens(text):
+    # close enough for benchmarks: about four characters per token
+    return max(1, len(text) // 4)
+
+
+def _to_object(value):
+    """Turn a response dict into attribute objects like the ones the openai package returns."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_object(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_object(item) for item in value]
+    return value
+
+
+class FakeChatClient:
+    """
+    In-process replacement for openai.OpenAI that answers chat completions locally.
+
+    Attributes:
+        latency (Latency): Time until the response (the first part when streaming)
+        token_delay (float): Time between streamed parts
+        failure_rate (float): Probability that a call raises the failure error
+        failure (str): Name of the injected error (see INJECTABLE_ERRORS)
+        stream_break_rate (float): Probability that a stream breaks off after its first part
+        responses (list): Scripted responses, [{"pattern": regex, "response": str or list}, ...];
+                          the first pattern found in the prompt answers, a list is answered in turn
+        default_response (str): Answer when no pattern matches ({n} is the call number)
+        models (dict): Settings that differ per model, e.g. {"gpt-5.4": {"failure_rate": 1.0}}
+        calls (list): (model, prompt) of every call, for assertions in benchmarks
+    """
+
+    def __init__(self, latency=None, token_delay=0.0, failure_rate=0.0, failure="RateLimitError",
+                 stream_break_rate=0.0, responses=(), default_response="Fake response {n}.", models=None, seed=None):
+        self.latency = latency or Latency()
+        self.token_delay = token_delay
+        self.failure_rate = failure_rate
+        self.failure = failure
+        self.stream_break_rate = stream_break_rate
+        self.responses = [(re.compile(rule["pattern"], re.I | re.S),
+                           itertools.cycle(rule["response"]) if isinstance(rule["response"], list) else rule["response"])
+                          for rule in responses]
+        self.default_response = default_response
+        self.models = models or {}
+        self.calls = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # same shape as openai.OpenAI: client.chat.completions.create(...)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create a fake from a settings dict (or the path of a JSON settings file).
+
+        The keys are the constructor arguments; "latency" is a dict of Latency arguments
+        or a number of seconds.
+        """
+        if isinstance(config, str):
+            with open(config, "r") as f:
+                config = json.load(f)
+        config = dict(config or {})
+        latency = config.pop("latency", None)
+        if isinstance(latency, dict):
+            latency = Latency(**latency)
+        elif latency is not None:
+            latency = Latency(mean=float(latency))
+        return cls(latency=latency, **config)
+
+    def _setting(self, model, name):
+        return self.models.get(model, {}).get(name, getattr(self, name))
+
+    def _latency(self, model):
+        latency = self.models.get(model, {}).get("latency")
+        if isinstance(latency, dict):
+            latency = Latency(**latency)
+        elif latency is not None:
+            latency = Latency(mean=float(latency))
+        with self._lock:
+            return (latency or self.latency).sample(self._rng)
+
+    def _answer(self, prompt, n):
+        for pattern, response in self.responses:
+            if pattern.search(prompt):
+                with self._lock:
+                    return next(response) if isinstance(response, itertools.cycle) else response
+        return self.default_response.format(n=n)
+
+    def respond(self, model, messages, stream=False, **_):
+        """
+        Produce the response as plain dicts (what the HTTP API sends as JSON).
+
+        Raises:
+            FakeAPIError: When a failure is injected (after the latency for timeouts)
+
+        Returns:
+            dict, or an iterator of chunk dicts when stream is True
+        """
+        prompt = messages[-1]["content"] if messages else ""
+        with self._lock:
+            self.calls.append((model, prompt))
+            n = len(self.calls)
+            fails = self._rng.random() < self._setting(model, "failure_rate")
+            breaks = stream and self._rng.random() < self._setting(model, "stream_break_rate")
+        if fails:
+            error = INJECTABLE_ERRORS[self._setting(model, "failure")]
+            if error is APITimeoutError:
+                time.sleep(self._latency(model))
+            raise error(f"Injected {error.__name__} for {model}")
+
+        answer = self._answer(prompt, n)
+        usage = {"prompt_tokens": sum(_count_tokens(m["content"]) for m in messages),
+                 "completion_tokens": _count_tokens(answer)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+        if not stream:
+            time.sleep(self._latency(model))
+            return {"id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": answer}}],
+                    "usage": usage}
+        return self._chunks(model, completion_id, answer, usage, breaks)
+
+    def _chunks(self, model, completion_id, answer, usage, breaks):
+        # the time to the first part is the sampled latency, then one part every token_delay seconds
+        time.sleep(self._latency(model))
+        token_delay = self._setting(model, "token_delay")
+        parts = re.findall(r"\S+\s*|\s+", answer)
+        for i, part in enumerate(parts):
+            if i:
+                time.sleep(token_delay)
+            yield {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                   "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}]}
+            if breaks:
+                raise APIConnectionError(f"Injected stream break for {model}")
+        yield {"id": completion_id, "object": "chat.completion.chunk", "model": model, "choices": [], "usage": usage}
+
+    def create(self, model, messages, stream=False, **kwargs):
+        """Answer a chat completion like openai's client.chat.completions.create."""
+        response = self.respond(model, messages, stream=stream, **kwargs)
+        if stream:
+            return (_to_object(chunk) for chunk in response)
+        return _to_object(response)
+
+
+# ===== BACKEND SELECTION =====
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def set_backend(client):
+    """Use client (e.g. a FakeChatClient) for every AI client of this process; None goes back to OpenAI."""
+    global _backend
+    _backend = client
+
+
+def active_backend():
+    """
+    Return the chat client replacing the OpenAI API, or None when the OpenAI API is used.
+
+    A backend set with set_backend wins; otherwise SMR_LLM_BACKEND=fake creates a shared
+    FakeChatClient from the SMR_FAKE_LLM settings file.
+    """
+    global _backend
+    if _backend is None and os.environ.get(BACKEND_VARIABLE, "openai").lower() == "fake":
+        with _backend_lock:
+            if _backend is None:
+                _backend = FakeChatClient.from_config(os.environ.get(FAKE_CONFIG_VARIABLE) or {})
+    return _backend
+
+
+def backend_name():
+    """Name of the selected backend ("openai" or the class of the replacement)."""
+    backend = active_backend()
+    return "openai" if backend is None else type(backend).__name__
+
+
+# ===== MOCK SERVER =====
+class MockChatServer:
+    """
+    Local HTTP server speaking the chat-completions protocol (POST /v1/chat/completions),
+    answering with a FakeChatClient. Streaming uses server-sent events like the OpenAI API.
+
+    Attributes:
+        fake (FakeChatClient): Produces the responses
+        host (str): Interface to listen on
+        port (int): Port to listen on (0 picks a free port)
+    """
+
+    def __init__(self, fake=None, host="127.0.0.1", port=0):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.fake = fake or FakeChatClient()
+        fake = self.fake
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                started = False
+                try:
+                    response = fake.respond(**request)
+                    if not request.get("stream"):
+                        self._send_json(200, response)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for chunk in response:
+                        started = True
+                        self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+                    self._write_chunk("data: [DONE]\n\n")
+                    self._write_chunk("")
+                except FakeAPIError as e:
+                    if request.get("stream") and started:
+                        # the stream broke off: close the connection without finishing the response
+                        self.close_connection = True
+                        return
+                    self._send_json(e.status_code, {"error": {"message": str(e), "type": type(e).__name__}})
+
+            def _write_chunk(self, text):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """The URL to use as OPENAI_BASE_URL."""
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self):
+        """Serve in a background thread and return self."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local mock of the OpenAI chat-completions API")
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--config", help="JSON settings file of the fake (latency, failures, responses)")
+    args = parser.parse_args()
+    server = MockChatServer(FakeChatClient.from_config(args.config or {}), args.host, args.port)
+    print(f"Mock chat-completions server on {server.base_url}")
+    print(f"Set OPENAI_BASE_URL={server.base_url} and OPENAI_API_KEY=local to use it. Ctrl+C stops it.")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
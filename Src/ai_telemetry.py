@@ -0,0 +1,131 @@
+"""
+ai_telemetry.py
+===============
+Latency and token usage of every AI call, per call site.
+
+The AI clients record one line per call in Data/Cache/ai_metrics.jsonl: the
+call site (spell_check, filename, text_to_html, nl_to_sql, summary, quiz,
+recommendation, ...), the model, the latency, the prompt and completion
+tokens and whether the answer came from the response cache. The report shows
+which prompts are slow or growing:
+
+    python ai_telemetry.py
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Default metrics file (next to the response cache)
+METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "Cache", "ai_metrics.jsonl")
+
+# Optional prices in USD per million tokens, (prompt, completion), used for the cost column of the report.
+# Fill in the models you use, e.g. "gpt-4.1-mini": (0.40, 1.60)
+PRICES_PER_MILLION = {}
+
+_write_lock = threading.Lock()
+
+
+def record_call(call_site, model, started, usage=None, cached=False, error=None, first_token_seconds=None,
+                path=METRICS_PATH):
+    """
+    Append the metrics of one AI call to the metrics file.
+
+    Args:
+        call_site (str): Name of the place the call was made from (None is recorded as "other")
+        model (str): The model that was called
+        started (float): time.perf_counter() when the call started
+        usage: The usage object of the API response (None for cache hits and failures)
+        cached (bool): The answer came from the response cache
+        error (str): Name of the error if the call failed
+        first_token_seconds (float): Time until the first streamed part arrived (streamed calls only)
+        path (str): Metrics file
+    """
+    entry = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "call_site": call_site or "other",
+        "model": model,
+        "latency": round(time.perf_counter() - started, 4),
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached": cached,
+        "error": error,
+    }
+    if first_token_seconds is not None:
+        entry["first_token_seconds"] = round(first_token_seconds, 4)
+    # telemetry must never break an AI call
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+    except OSError:
+        pass
+
+
+def load_metrics(path=METRICS_PATH):
+    """Return the recorded calls as a DataFrame (empty if nothing was recorded yet)."""
+    import pandas as pd
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["time", "call_site", "model", "latency", "prompt_tokens",
+                                     "completion_tokens", "cached", "error"])
+    df = pd.read_json(path, lines=True)
+    df["time"] = pd.to_datetime(df["time"])
+    return df
+
+
+def _cost(row):
+    prices = PRICES_PER_MILLION.get(row["model"])
+    if prices is None:
+        return float("nan")
+    return (row["prompt_tokens"] * prices[0] + row["completion_tokens"] * prices[1]) / 1_000_000
+
+
+def summary_report(path=METRICS_PATH):
+    """
+    Summarize the recorded calls per call site.
+
+    Returns:
+        pd.DataFrame: Calls, cache hits, errors, p50/p95 latency of the API calls (cache hits excluded),
+                      average prompt and completion tokens and total cost (if prices are set)
+    """
+    df = load_metrics(path)
+    if df.empty:
+        return df
+    df["cost"] = df.apply(_cost, axis=1)
+    api_calls = df[~df["cached"].astype(bool) & df["error"].isna()]
+    report = df.groupby("call_site").agg(calls=("model", "size"),
+                                         cache_hits=("cached", "sum"),
+                                         errors=("error", "count"),
+                                         cost=("cost", "sum"))
+    latency = api_calls.groupby("call_site")["latency"]
+    report["p50_latency"] = latency.quantile(0.5)
+    report["p95_latency"] = latency.quantile(0.95)
+    report["avg_prompt_tokens"] = api_calls.groupby("call_site")["prompt_tokens"].mean().round()
+    report["avg_completion_tokens"] = api_calls.groupby("call_site")["completion_tokens"].mean().round()
+    return report.sort_values("calls", ascending=False)
+
+
+def tokens_per_day(path=METRICS_PATH):
+    """
+    Return the prompt tokens sent per day and call site, to spot prompts that grow over time.
+
+    Returns:
+        pd.DataFrame: One row per day, one column per call site
+    """
+    df = load_metrics(path)
+    if df.empty:
+        return df
+    df["day"] = df["time"].dt.date
+    return df.pivot_table(index="day", columns="call_site", values="prompt_tokens", aggfunc="sum", fill_value=0)
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print("Calls per call site:\n")
+        print(summary_report())
+        print("\nPrompt tokens per day:\n")
+        print(tokens_per_day().tail(30))
@@ -0,0 +1,172 @@
+"""
+asset_store.py
+==============
+Content-addressed storage for the images used in the learning material.
+
+Every image is stored once under the SHA-256 hash of its bytes, so the same
+screenshot used by several single files (and repeated in every review file it
+appears in) only exists once on disk. HTML files reference the images by a
+relative path and a data-asset attribute holding the asset name, which lets
+review pages in another folder point to the same file.
+
+Run this module directly to move the inline base64 images of existing single
+and review files into the asset store:
+
+    python asset_store.py
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+from urllib.parse import quote
+
+# <img src="data:image/png;base64,..."> written by earlier versions of the program
+INLINE_IMAGE_PATTERN = re.compile(r'src="data:image/([a-zA-Z0-9.+-]+);base64,([A-Za-z0-9+/=\s]+)"')
+# <img src="..." data-asset="..."> and <a href="..." data-asset="..."> written for images in the asset store
+# (images from the image pipeline also name their thumbnail in data-thumbnail)
+ASSET_REFERENCE_PATTERN = re.compile(r'(src|href)="[^"]*" data-asset="([^"]+)"(?: data-thumbnail="([^"]+)")?')
+
+
+def default_assets_path(single_files_path):
+    """Return the default asset folder: an Assets folder next to the single files folder."""
+    return os.path.join(os.path.dirname(os.path.normpath(single_files_path)), "Assets")
+
+
+class AssetStore:
+    """
+    Deduplicated image storage keyed by content hash.
+
+    Attributes:
+        root (str): Folder that holds the assets (files are spread over two-letter subfolders)
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, name):
+        """Return the file path of an asset name (<sha256>.<extension>)."""
+        return os.path.join(self.root, name[:2], name)
+
+    def put(self, data, extension="png"):
+        """
+        Store image bytes, reusing the existing file if the same image was stored before.
+
+        Args:
+            data (bytes): The image bytes
+            extension (str): File extension of the image format (without the dot)
+
+        Returns:
+            str: The asset name (<sha256>.<extension>)
+        """
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension.lower().lstrip('.')}"
+        path = self.path_for(name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write to a temporary file first so a crash never leaves a half written asset behind
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return name
+
+    def put_file(self, file_path):
+        """Store an image file and return its asset name."""
+        extension = os.path.splitext(file_path)[1].lstrip(".") or "png"
+        with open(file_path, "rb") as f:
+            return self.put(f.read(), extension)
+
+    def url_for(self, name, html_dir):
+        """
+        Return the src to use for an asset in an HTML file saved in html_dir.
+
+        Args:
+            name (str): The asset name
+            html_dir (str): Folder of the HTML file that references the asset
+
+        Returns:
+            str: URL-quoted path of the asset relative to html_dir
+        """
+        relative = os.path.relpath(self.path_for(name), html_dir).replace("\\", "/")
+        return quote(relative)
+
+    def img_attributes(self, name, html_dir, thumbnail=None, attribute="src", use_thumbnail=False):
+        """
+        Return the attributes that reference an asset from an HTML file saved in html_dir.
+
+        Args:
+            name (str): The asset name
+            html_dir (str): Folder of the HTML file
+            thumbnail (str): Asset name of the image's thumbnail, if there is one
+            attribute (str): "src" for <img> tags, "href" for links
+            use_thumbnail (bool): Point the attribute to the thumbnail instead of the image itself
+        """
+        target = thumbnail if use_thumbnail and thumbnail else name
+        attributes = f'{attribute}="{self.url_for(target, html_dir)}" data-asset="{name}"'
+        if thumbnail:
+            attributes += f' data-thumbnail="{thumbnail}"'
+        return attributes
+
+    def relink(self, html, html_dir, use_thumbnails=False):
+        """
+        Point the asset references of an HTML fragment to the right path for a file saved in html_dir.
+
+        Used when content of a single file is copied into a review file in another folder.
+
+        Args:
+            html (str): The HTML fragment
+            html_dir (str): Folder of the file the fragment is written to
+            use_thumbnails (bool): Show the thumbnail of images that have one (links keep pointing to the full image)
+        """
+        def relink_reference(match):
+            attribute, name, thumbnail = match.groups()
+            return self.img_attributes(name, html_dir, thumbnail, attribute, use_thumbnails and attribute == "src")
+        return ASSET_REFERENCE_PATTERN.sub(relink_reference, html)
+
+
+def migrate_inline_images(html_dir, store):
+    """
+    Move the inline base64 images of every HTML file in a folder into the asset store.
+
+    Args:
+        html_dir (str): Folder with the single or review HTML files
+        store (AssetStore): The asset store to move the images to
+
+    Returns:
+        dict: Number of files changed, images extracted and bytes saved
+    """
+    stats = {"files": 0, "images": 0, "bytes_saved": 0}
+    for file_name in os.listdir(html_dir):
+        if not file_name.endswith(".html"):
+            continue
+        file_path = os.path.join(html_dir, file_name)
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        def extract(match):
+            image_format, data = match.group(1), match.group(2)
+            extension = {"jpeg": "jpg", "svg+xml": "svg"}.get(image_format.lower(), image_format.lower())
+            name = store.put(base64.b64decode(re.sub(r"\s", "", data)), extension)
+            stats["images"] += 1
+            return store.img_attributes(name, html_dir)
+
+        migrated = INLINE_IMAGE_PATTERN.sub(extract, content)
+        if migrated != content:
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(migrated)
+            stats["files"] += 1
+            stats["bytes_saved"] += len(content.encode("utf-8")) - len(migrated.encode("utf-8"))
+    return stats
+
+
+if __name__ == "__main__":
+    # Load paths from config.json file (the same configuration used by SpacedMemoryReview)
+    with open("config.json", "r") as f:
+        paths = json.load(f)
+    asset_store = AssetStore(paths.get("assets_path") or default_assets_path(paths["single_files_path"]))
+    for folder in (paths["single_files_path"], paths["review_files_path"]):
+        result = migrate_inline_images(folder, asset_store)
+        print(f"{folder}: {result['images']} images moved out of {result['files']} files "
+              f"({result['bytes_saved'] / 1_000_000:.1f} MB saved)")
@@ -1,5 +1,11 @@
 from AI_text_to_query_converter import natural_language_to_query
-from AI_class import OpenAIClient, Reasoning_OpenAIClient
+from AI_class import Reasoning_OpenAIClient, ResilientClient, AIError, get_client
+from material_sidecar import load_sidecar, SidecarStore, default_sidecars_path
+from search_index import get_search_index
+from query_cache import is_relative, has_explicit_date
+from query_context import estimate_tokens
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
 from IPython.display import display, Markdown, clear_output
 import time
 import pandas as pd
@@ -7,11 +13,140 @@ import os
 import math
 import textwrap
 
+
+def display_stream(parts, refresh_seconds=0.1):
+    """
+    Show a streamed Markdown response while it arrives and return the complete text.
+
+    In a notebook the output cell is updated in place (at most every refresh_seconds),
+    outside IPython the parts are printed as they come.
+
+    Args:
+        parts (iterable): The parts of the response (e.g. from ResilientClient.stream)
+        refresh_seconds (float): Minimum time between two updates of the notebook output
+
+    Returns:
+        str: The complete response
+    """
+    from IPython import get_ipython
+    text = ""
+    if get_ipython() is None:
+        for part in parts:
+            text += part
+            print(part, end="", flush=True)
+        print()
+        return text
+    handle = display(Markdown(""), display_id=True)
+    last_update = 0
+    for part in parts:
+        text += part
+        if time.monotonic() - last_update >= refresh_seconds:
+            handle.update(Markdown(text))
+            last_update = time.monotonic()
+    handle.update(Markdown(text))
+    return text
+
+
+# Matches scoring less than this share of the best match are not selected (there is no limit on the number
+# of files, large selections are summarized part by part)
+MIN_RELATIVE_SCORE = 0.25
+
+
+# Material up to this size (in estimated tokens) is summarized in one prompt, larger selections part by part
+SINGLE_PROMPT_TOKENS = 12000
+# Size of each part of the material (and of each group of partial summaries) in the map-reduce mode
+CHUNK_TOKENS = 6000
+# Number of parts summarized at the same time
+MAX_PARALLEL_SUMMARIES = 4
+
+SUMMARY_INSTRUCTIONS = """Summarize the key points and main ideas in a clear and organized manner.
+                     Each subject and topic should be clearly labeled in the summary. They should also be bolded.
+                     IMPORTANT: THE EXACT CONTENT SHOULD BE SUMMARIZED EVEN IF YOU THINK IT IS NOT NECESSARILY THE TYPICAL WAY OF PRESENTING
+                     THE INFORMATION.
+                     
+                     If there is no material for a specific subject or topic, please indicate that the content is 
+                     contained in the image portion of the file and cannot be summarized.
+                     
+                     Please do not provide any additional information beyond the summary. No follow-up questions or comments 
+                     and no introductory remarks. Just the summary.
+                  """
+
+
+def progress_display():
+    """Return a function that shows a progress message, replacing the previous one in a notebook."""
+    from IPython import get_ipython
+    if get_ipython() is None:
+        return lambda text: print(text, flush=True)
+    handle = display(Markdown(""), display_id=True)
+    return lambda text: handle.update(Markdown(text))
+
+
+def split_into_chunks(sections, chunk_tokens=CHUNK_TOKENS):
+    """
+    Pack the sections (e.g. one per file) into chunks of at most chunk_tokens estimated tokens.
+
+    Sections are kept whole when they fit, a larger section is split at paragraph or line breaks
+    (and a single huge paragraph by length).
+
+    Returns:
+        list: The chunks, in the order of the sections
+    """
+    pieces = []
+    for section in sections:
+        if estimate_tokens(section) <= chunk_tokens:
+            pieces.append(section)
+            continue
+        for paragraph in section.replace("<br>", "\n").split("\n"):
+            # the character length that fits in a chunk (about four characters per token)
+            step = chunk_tokens * 4
+            pieces.extend(paragraph[i:i + step] for i in range(0, len(paragraph), step))
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and estimate_tokens(current + "\n" + piece) > chunk_tokens:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 class AISummaryTool:
-    def __init__(self):
+    def __init__(self, use_ai_query=False):
+        """
+        Args:
+            use_ai_query (bool): Always select the material with an AI generated SQL query instead of
+                                 searching its content (questions about dates use the query either way)
+        """
         self.BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        self.query_output_file = os.path.join(self.BASE_DIR, "query_output.csv")
+        self.use_ai_query = use_ai_query
+        self.search_index = None
+        # the content search index sits next to the sidecars of the single files
+        if os.path.exists("config.json"):
+            with open("config.json", "r") as f:
+                single_files_path = json.load(f).get("single_files_path")
+            if single_files_path:
+                self.search_index = get_search_index(SidecarStore(default_sidecars_path(single_files_path)))
         
+    def search_files(self, question):
+        """
+        Select the material whose content best matches the question, without calling a model.
+
+        Returns:
+            tuple: (files, subjects, topics), best match first (empty lists if nothing matches)
+        """
+        from duck_database_runner import get_engine
+        # index items saved since the last search (and older files that have no sidecar yet)
+        file_paths = get_engine().query("SELECT DISTINCT FilePath FROM learned_material WHERE FilePath IS NOT NULL")
+        self.search_index.sync(file_paths["FilePath"].tolist())
+        results = self.search_index.search(question, limit=None, min_relative_score=MIN_RELATIVE_SCORE)
+        if results:
+            display(Markdown(f"**Selected {len(results)} file(s) by content:**\n\n" +
+                             "\n".join(f"- {r['subject']}: {r['topic']} ({r['date']})" for r in results)))
+        return ([r["file"] for r in results], [r["subject"] for r in results], [r["topic"] for r in results])
+
 
     def find_files(self, quiz=False):
      try:
@@ -22,9 +157,19 @@ class AISummaryTool:
         question = input("Submit Material here: ")
         # display(Markdown(f"Your Entered: __{question}__"))
         time.sleep(1)
-        natural_language_to_query(question, display_output=False, purpose="summary")
+        # the content search answers locally; dates ("last month") need the SQL query
+        if not self.use_ai_query and self.search_index is not None and not (is_relative(question)
+                                                                             or has_explicit_date(question)):
+            files, subjects, topics = self.search_files(question)
+            if files:
+                self.num_files = len(files)
+                return files, subjects, topics
+        df = natural_language_to_query(question, display_output=False, purpose="summary")
+        # no results when the question could not be turned into a valid query or the query failed
+        if df is None:
+            self.num_files = 0
+            return [], [], []
         
-        df = pd.read_csv(self.query_output_file)
         files = df['FilePath'].dropna().tolist()
         subjects = df['Subject'].dropna().tolist()
         topics = df['Topic'].dropna().tolist()
@@ -39,20 +184,16 @@ class AISummaryTool:
      try:
         files, subjects, topics = self.find_files(quiz=quiz)
         material_content = ""
+        # the material of each file on its own, for the part by part summary of large selections
+        self.sections = []
         for i in files:
-            with open(i, 'r', encoding='utf-8') as file:
-                content = file.read()
-                section_start = content.find('<div id="text">')
-                section_end = content.find('</div><br>', section_start)
-                section_content = content[section_start:section_end]
-
-                # extra check to ensure that the base 64 images are removed
-                base64_pos = section_content.find('png;base64')
-                if base64_pos != -1:  # Only truncate if "base64" is found
-                   section_content = section_content[:base64_pos]
-                material_content += f"\n\n### Subject: {subjects[files.index(i)]}\n"
-                material_content += f"### Topic: {topics[files.index(i)]}\n"
-                material_content += section_content
+            # only the text part is needed, read it from the file's sidecar instead of parsing the HTML file
+            section_content = load_sidecar(i)["text_html"]
+            section = f"\n\n### Subject: {subjects[files.index(i)]}\n"
+            section += f"### Topic: {topics[files.index(i)]}\n"
+            section += section_content
+            self.sections.append(section)
+            material_content += section
         return material_content
      except Exception as e:
         display(Markdown(f"**An error occurred while extracting material:\n{e}**"))
@@ -65,35 +206,90 @@ class AISummaryTool:
             return None
         
         # Initialize the AI client to gpt 5.1 and  with high reasoning and verbosity for better summaries
-        ai = Reasoning_OpenAIClient(model_name="gpt-5.2", reasoning="high", verbosity="high", system_role_content="You are an expert at summarizing educational material.")
-        prompt = f"""Please provide a concise summary of the following material:\n\n{material_content}\n\n:
-                     Summarize the key points and main ideas in a clear and organized manner.
-                     Each subject and topic should be clearly labeled in the summary. They should also be bolded.
-                     IMPORTANT: THE EXACT CONTENT SHOULD BE SUMMARIZED EVEN IF YOU THINK IT IS NOT NECESSARILY THE TYPICAL WAY OF PRESENTING
-                     THE INFORMATION.
-                     
-                     If there is no material for a specific subject or topic, please indicate that the content is 
-                     contained in the image portion of the file and cannot be summarized.
-                     
-                     Please do not provide any additional information beyond the summary. No follow-up questions or comments 
-                     and no introductory remarks. Just the summary.
-                  """
-
+        # if the reasoning model fails (e.g. token limit reached) the standard OpenAIClient takes over
+        ai = ResilientClient(
+            get_client(Reasoning_OpenAIClient, model_name="gpt-5.2", reasoning="high", verbosity="high", system_role_content="You are an expert at summarizing educational material."),
+            get_client(model_name="gpt-4.1-mini", system_role_content="You are an expert at summarizing educational material."))
+        
         display(Markdown("**Summarizing your material...**"))
         time.sleep(1)
         clear_output(wait=True)
         
-        summary = ai.get_response(prompt)
+        if estimate_tokens(material_content) <= SINGLE_PROMPT_TOKENS:
+            prompt = f"""Please provide a concise summary of the following material:\n\n{material_content}\n\n:
+                     {SUMMARY_INSTRUCTIONS}"""
+        else:
+            # too much material for one prompt: summarize it part by part and summarize the summaries
+            partial_summaries = self.summarize_in_parts(ai, self.sections)
+            if not partial_summaries:
+                return None
+            prompt = f"""The following are summaries of consecutive parts of the material.
+                     Combine them into one concise summary of the whole material, merging what belongs to the same
+                     subject and topic:\n\n{partial_summaries}\n\n:
+                     {SUMMARY_INSTRUCTIONS}"""
         
-        # if token limit is reached fallback to standard OpenAIClient
-        if summary.startswith("An error occurred"):
-            backup_ai = OpenAIClient(model_name="gpt-4.1-mini", system_role_content="You are an expert at summarizing educational material.")
-            summary = backup_ai.get_response(prompt)
-        display(Markdown(summary))
+        # the summary is shown while it is being written
+        try:
+            summary = display_stream(ai.stream(prompt, call_site="summary"))
+        except AIError as e:
+            display(Markdown(f"**The summary could not be generated:** {e}"))
+            return None
         return summary
         
 
+    def summarize_in_parts(self, ai, sections, chunk_tokens=CHUNK_TOKENS, max_parallel=MAX_PARALLEL_SUMMARIES):
+        """
+        Map-reduce step of the summary of a large selection.
+
+        The material is split into chunks of at most chunk_tokens, the chunks are summarized
+        concurrently (at most max_parallel at a time) and, while the partial summaries are still
+        too long for one prompt, groups of them are summarized again the same way.
+
+        Args:
+            ai (ResilientClient): The client used for the partial summaries
+            sections (list): The material of each file
+            chunk_tokens (int): Size of a chunk in estimated tokens
+            max_parallel (int): Number of summaries generated at the same time
+
+        Returns:
+            str: The partial summaries, short enough to be combined in one prompt (None if they all failed)
+        """
+        show_progress = progress_display()
+        chunks = split_into_chunks(sections, chunk_tokens)
+        level = 1
+        while True:
+            summaries = [None] * len(chunks)
+            done = failed = 0
+            show_progress(f"**Summarizing part 0 of {len(chunks)}...**")
+            with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="summary") as executor:
+                futures = {executor.submit(ai.get_response,
+                                           f"""Please provide a concise summary of the following part of the material:\n\n{chunk}\n\n:
+                                           {SUMMARY_INSTRUCTIONS}""",
+                                           call_site="summary_map" if level == 1 else "summary_reduce"): i
+                           for i, chunk in enumerate(chunks)}
+                for future in as_completed(futures):
+                    try:
+                        summaries[futures[future]] = future.result()
+                    except AIError as e:
+                        # the other parts are still worth summarizing
+                        summaries[futures[future]] = f"*(Part {futures[future] + 1} could not be summarized: {e})*"
+                        failed += 1
+                    done += 1
+                    show_progress(f"**Summarizing part {done} of {len(chunks)}...**")
+            if failed == len(chunks):
+                show_progress("**The summary could not be generated.**")
+                return None
+            combined = "\n\n".join(summaries)
+            # still too long: summarize groups of the partial summaries (unless the summaries no longer get shorter)
+            groups = split_into_chunks(summaries, chunk_tokens)
+            if estimate_tokens(combined) <= chunk_tokens or len(groups) >= len(chunks):
+                show_progress(f"**Summarized {len(sections)} file(s) in {len(chunks)} part(s), combining...**")
+                return combined
+            chunks = groups
+            level += 1
+
     def generate_quiz(self, difficulty="intermediate", interactive=False):
+     # quizzes are never answered from the response cache so the same material gives new questions
      try:
         content = self.extract_material(quiz=True)
         # MUST ADD A CHECK TO SEE IF CONTENT IS EMPTY
@@ -113,7 +309,10 @@ class AISummaryTool:
         display(Markdown(f"**Generating {difficulty} level quiz with {quiz_length} questions...**"))
         
         if not interactive:
-            ai = Reasoning_OpenAIClient(model_name="gpt-5.4", reasoning="high", verbosity="high", system_role_content="You are an expert at creating quizzes based on educational material.")
+            # if the reasoning model fails (e.g. token limit reached) the standard OpenAIClient takes over
+            ai = ResilientClient(
+                get_client(Reasoning_OpenAIClient, model_name="gpt-5.4", reasoning="high", verbosity="high", system_role_content="You are an expert at creating quizzes based on educational material."),
+                get_client(model_name="gpt-4.1-mini", system_role_content="You are an expert at creating quizzes based on educational material."))
             prompt = textwrap.dedent(f"""
                 Based on the following content, create a quiz of {difficulty} level difficulty.
                 Here is the content:
@@ -160,16 +359,14 @@ class AISummaryTool:
 
             time.sleep(1.8)
             clear_output(wait=True)
-            quiz = ai.get_response(prompt)
-            
-            # if token limit is reached fallback to standard OpenAIClient
-            if quiz.startswith("An error occurred"):
-                backup_ai = OpenAIClient(model_name="gpt-4.1-mini", system_role_content="You are an expert at creating quizzes based on educational material.")
-                quiz = backup_ai.get_response(prompt)
-            display(Markdown(quiz))
+            # the quiz is shown while it is being written
+            quiz = display_stream(ai.stream(prompt, use_cache=False, call_site="quiz"))
             return quiz
         else:
-            ai = Reasoning_OpenAIClient(model_name="gpt-5.4", reasoning="high", verbosity="high", system_role_content="You are an expert at creating quizzes based on educational material.")
+            # if the reasoning model fails (e.g. token limit reached) the standard OpenAIClient takes over
+            ai = ResilientClient(
+                get_client(Reasoning_OpenAIClient, model_name="gpt-5.4", reasoning="high", verbosity="high", system_role_content="You are an expert at creating quizzes based on educational material."),
+                get_client(model_name="gpt-4.1-mini", system_role_content="You are an expert at creating quizzes based on educational material."))
             
             if difficulty == "advanced":
                 quiz_length = self.num_files * 2  # e.g., 2 questions per file
@@ -229,12 +426,7 @@ class AISummaryTool:
 
             time.sleep(1.8)
             clear_output(wait=True)
-            quiz = ai.get_response(prompt)
-            
-            # if token limit is reached fallback to standard OpenAIClient
-            if quiz.startswith("An error occurred"):
-                backup_ai = OpenAIClient(model_name="gpt-4.1-mini", system_role_content="You are an expert at creating quizzes based on educational material.")
-                quiz = backup_ai.get_response(prompt)
+            quiz = ai.get_response(prompt, use_cache=False, call_site="quiz")
             
             data = quiz.split('|||')
             questions = data[:len(data)//2]
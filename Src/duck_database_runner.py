@@ -2,8 +2,14 @@ import duckdb
 import pandas as pd
 import sys
 import os
+import re
+import threading
+import time
 from IPython.display import Markdown, HTML, display
 from datetime import datetime
+from learned_material_store import LearnedMaterialStore
+from material_sidecar import SidecarStore, default_sidecars_path
+from search_index import get_search_index, snippet, tokenize
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 INPUT_SQL_PATH = os.path.join(BASE_DIR, 'sql_query.sql')
@@ -11,57 +17,330 @@ OUTPUT_CSV_PATH = os.path.join(BASE_DIR, 'query_output.csv')
 CSV_SOURCE_PATH = os.path.join(BASE_DIR, '../Data/learned_material.csv')
 SQL_ERROR_PATH = os.path.join(BASE_DIR, 'sql_error_message.txt')
 
+
+class QueryError(Exception):
+    """
+    Raised when DuckDB fails to run a query against the learned_material view.
+
+    Attributes:
+        sql (str): The query that failed
+        message (str): The error message reported by DuckDB
+        error_type (str): The DuckDB exception class (e.g. ParserException, BinderException)
+    """
+
+    def __init__(self, sql, error):
+        self.sql = sql
+        self.message = str(error)
+        self.error_type = type(error).__name__
+        super().__init__(self.message)
+
+    def __str__(self):
+        # same text that used to be written to sql_error_message.txt so it can be displayed as is
+        return f"Error occurred:\n{self.message}\n"
+
+
+# First day of the learning history that is exposed to queries
+START_DATE = '2025-04-21'
+
+# Builds the normalized copy of the store's learned_material table. Subject and Topic are cleaned of
+# leading and trailing white spaces and multiple spaces between words are replaced with a single space
+# (null values are kept for record keeping). Crucial for filtering and grouping consistently.
+NORMALIZE_SQL = r"""
+    CREATE OR REPLACE TABLE learned_material_normalized AS
+    SELECT "Index",
+           Date,
+           FilePath,
+           trim(regexp_replace(Subject, '\s+', ' ', 'g')) AS Subject,
+           trim(regexp_replace(Topic, '\s+', ' ', 'g')) AS Topic
+    FROM learned_store.learned_material
+"""
+
+# Fingerprint of the table contents, used to skip a rebuild when the file changed but the data did not
+CONTENT_HASH_SQL = """
+    SELECT md5(COALESCE(string_agg(concat_ws('|', "Index", Date, FilePath, Subject, Topic), chr(10) ORDER BY Date, "Index", Entry), ''))
+    FROM learned_store.learned_material
+"""
+
+
+# Search results kept per query text for the content_score function (a query calls it once per row)
+CONTENT_SCORE_CACHE_SIZE = 32
+# Queries that read the learned_content table or call one of the content functions (whole names only, so
+# e.g. a learned_content_count alias does not count)
+CONTENT_REFERENCE = re.compile(r"\b(learned_content|content_score|content_snippet)\b", re.I)
+
+# The store's database file is locked while another notebook writes to it: retry this many times,
+# waiting a little longer each time (LOCK_RETRY_SECONDS, then twice as long, ...)
+LOCK_RETRIES = 3
+LOCK_RETRY_SECONDS = 0.5
+
+
+class QueryEngine:
+    """
+    In-process query engine over the learned_material data.
+
+    Keeps one in-memory DuckDB connection alive for the whole session with the
+    learned_material view created once, so queries from the query tool, the standard
+    queries and the AI text-to-SQL converter run without starting a new Python process
+    or passing the query and results through files.
+
+    The cleaned data is materialized in the learned_material_normalized table, which is
+    only rebuilt when the source data changes. Changes are detected by the modification
+    time and size of the CSV and DuckDB files, and confirmed with a hash of the table
+    contents before the (regex based) normalization is run again.
+
+    The text of the single files is available in the learned_content table (FilePath,
+    Subject, Topic, Date, Content, Words), joinable with learned_material on FilePath, with
+    two functions for full-text search:
+        content_score(FilePath, 'search words')   BM25 relevance of the file (0 if nothing matches)
+        content_snippet(Content, 'search words')  the passage around the first match (HTML, matches in <mark>)
+    The table is filled from the content search index (see search_index.py) when a query
+    uses it, and only rebuilt when items were saved or changed.
+
+    Attributes:
+        csv_path (str): Path to the CSV data file the store belongs to
+        store (LearnedMaterialStore): The DuckDB store the data is read from
+        con (duckdb.DuckDBPyConnection): The long-lived in-memory connection
+    """
+
+    def __init__(self, csv_path=CSV_SOURCE_PATH):
+        self.csv_path = csv_path
+        # the CSV file is synced by the first refresh, where errors are reported as QueryError
+        self.store = LearnedMaterialStore(csv_path, sync=False)
+        self.con = duckdb.connect()
+        # a DuckDB connection must not be used by two threads at the same time
+        self._lock = threading.Lock()
+        # cache state (see cache_info)
+        self._signature = None
+        self._content_hash = None
+        self._built_at = None
+        self._stats = {"hits": 0, "rebuilds": 0, "unchanged_content": 0}
+        # (content hash of the data, number of indexed items) the learned_content table was built for
+        self._content_signature = None
+        self._score_cache = {}
+        self._indexes = []
+        self._checked_refresh()
+        # the view reads from the materialized table, so it only has to be created once
+        # (the date filter stays in the view so "today" moves forward without a rebuild)
+        self.con.execute(f"""
+            CREATE OR REPLACE VIEW learned_material AS
+            SELECT Index, Date, FilePath, Subject, Topic FROM learned_material_normalized
+            WHERE Date BETWEEN DATE '{START_DATE}' AND current_date
+        """)
+        self.con.execute("CREATE TABLE learned_content (FilePath VARCHAR, Subject VARCHAR, Topic VARCHAR, "
+                         "Date DATE, Content VARCHAR, Words INTEGER)")
+        self.con.create_function("content_score", self._content_score, ["VARCHAR", "VARCHAR"], "DOUBLE",
+                                 side_effects=False)
+        self.con.create_function("content_snippet", lambda text, words: snippet(text, tokenize(words), as_html=True),
+                                 ["VARCHAR", "VARCHAR"], "VARCHAR", side_effects=False)
+
+    def _source_signature(self):
+        """Modification time and size of the CSV file together with the version of the DuckDB store."""
+        csv_signature = ()
+        if os.path.exists(self.csv_path):
+            stat = os.stat(self.csv_path)
+            csv_signature = (stat.st_mtime_ns, stat.st_size)
+        return csv_signature + self.store.version()
+
+    def _refresh(self):
+        """Rebuild the normalized table if the source data changed since it was last built."""
+        signature = self._source_signature()
+        if signature == self._signature:
+            self._stats["hits"] += 1
+            return
+        # the CSV file may have been replaced (e.g. reset of the program), let the store re-import it first
+        self.store.sync_with_csv()
+        with self.store.lock:
+            # fold entries still waiting in the log into learned_material before reading it
+            self.store.compact()
+            # ATTACH does not accept a prepared parameter, so the path is quoted by hand
+            db_path = self.store.db_path.replace("'", "''")
+            self.con.execute(f"ATTACH '{db_path}' AS learned_store (READ_ONLY)")
+            try:
+                content_hash = self.con.execute(CONTENT_HASH_SQL).fetchone()[0]
+                if content_hash == self._content_hash:
+                    self._stats["unchanged_content"] += 1
+                else:
+                    self.con.execute(NORMALIZE_SQL)
+                    self._content_hash = content_hash
+                    self._built_at = datetime.now()
+                    self._stats["rebuilds"] += 1
+            finally:
+                self.con.execute("DETACH learned_store")
+            # read the signature again as the sync and compaction may have rewritten the store
+            self._signature = self._source_signature()
+
+    def _checked_refresh(self, sql=None, content=False):
+        """
+        Refresh the normalized table (and the learned_content table if content is True), reporting failures as QueryError.
+
+        Reading the store can fail for reasons unrelated to the query: the database file is locked by
+        another notebook that is saving, or the CSV file or a sidecar cannot be read. Lock conflicts are
+        retried a few times before giving up.
+
+        Args:
+            sql (str): The query the refresh is done for (part of the error)
+            content (bool): Also bring the learned_content table up to date
+
+        Raises:
+            QueryError: If the data could not be read
+        """
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                self._refresh()
+                if content:
+                    self._refresh_content()
+                return
+            except duckdb.IOException as e:
+                if attempt < LOCK_RETRIES and "lock" in str(e).lower():
+                    time.sleep(LOCK_RETRY_SECONDS * 2 ** attempt)
+                    continue
+                raise QueryError(sql, e) from e
+            except (duckdb.Error, OSError, ValueError) as e:
+                raise QueryError(sql, e) from e
+
+    def _content_indexes(self):
+        """The content search indexes of the single file folders that hold the saved items."""
+        file_paths = self.con.execute(
+            "SELECT DISTINCT FilePath FROM learned_material_normalized WHERE FilePath IS NOT NULL").fetchall()
+        # folders next to each other share one sidecar folder (and index)
+        indexes = {}
+        for (file_path,) in file_paths:
+            root = default_sidecars_path(os.path.dirname(file_path))
+            if root not in indexes:
+                indexes[root] = (get_search_index(SidecarStore(root)), [])
+            indexes[root][1].append(file_path)
+        return list(indexes.values())
+
+    def _refresh_content(self):
+        """Bring the learned_content table up to date with the content search index."""
+        indexes = self._content_indexes()
+        changed = sum(index.sync(paths) for index, paths in indexes)
+        signature = (self._content_hash, sum(len(index.docs) for index, _ in indexes))
+        if not changed and signature == self._content_signature:
+            return
+        rows = [(file_path, subject, topic, date, text, len(text.split()))
+                for index, _ in indexes for file_path, subject, topic, date, text in index.contents()]
+        content = pd.DataFrame(rows, columns=["FilePath", "Subject", "Topic", "SavedDate", "Content", "Words"])
+        self.con.register("content_rows", content)
+        try:
+            self.con.execute(r"""
+                CREATE OR REPLACE TABLE learned_content AS
+                SELECT FilePath,
+                       trim(regexp_replace(Subject, '\s+', ' ', 'g')) AS Subject,
+                       trim(regexp_replace(Topic, '\s+', ' ', 'g')) AS Topic,
+                       try_strptime(SavedDate, '%m/%d/%Y')::DATE AS Date,
+                       Content,
+                       Words::INTEGER AS Words
+                FROM content_rows
+            """)
+        finally:
+            self.con.unregister("content_rows")
+        self._score_cache.clear()
+        self._content_signature = signature
+        # the indexes the scores are read from (content_score cannot query the connection it runs on)
+        self._indexes = [index for index, _ in indexes]
+
+    def _content_score(self, file_path, words):
+        """BM25 score of a file for the search words (used as the content_score SQL function)."""
+        scores = self._score_cache.get(words)
+        if scores is None:
+            scores = {}
+            for index in self._indexes:
+                scores.update({result["file"]: result["score"] for result in index.search(words, limit=None)})
+            if len(self._score_cache) >= CONTENT_SCORE_CACHE_SIZE:
+                self._score_cache.clear()
+            self._score_cache[words] = scores
+        return scores.get(file_path, 0.0)
+
+    def cache_info(self):
+        """
+        Report the state of the materialized learned_material_normalized table for diagnostics.
+
+        Returns:
+            dict: source paths, current signature and content hash, when the table was last built,
+                  and counters for cache hits, rebuilds and changes that turned out not to alter the data
+        """
+        with self._lock:
+            rows = self.con.execute("SELECT COUNT(*) FROM learned_material_normalized").fetchone()[0]
+            return {
+                "csv_path": self.csv_path,
+                "db_path": self.store.db_path,
+                "signature": self._signature,
+                "content_hash": self._content_hash,
+                "built_at": self._built_at,
+                "rows": rows,
+                **self._stats,
+            }
+
+    def data_version(self):
+        """
+        Return a fingerprint of the current data (the content hash of the normalized table).
+
+        Results derived from the data (e.g. the AI query context) can be cached under it.
+
+        Raises:
+            QueryError: If the data could not be read
+        """
+        with self._lock:
+            self._checked_refresh()
+            return self._content_hash
+
+    def query(self, sql, arrow=False):
+        """
+        Run a SQL query against the learned_material view.
+
+        Args:
+            sql (str): The SQL query to execute
+            arrow (bool): Return a pyarrow Table instead of a DataFrame. Default is False.
+
+        Returns:
+            pd.DataFrame | pyarrow.Table: The query result
+
+        Raises:
+            QueryError: If the data could not be read or DuckDB cannot parse, bind or run the query
+        """
+        with self._lock:
+            # the content table is only looked at when a query uses it
+            self._checked_refresh(sql, content=CONTENT_REFERENCE.search(sql) is not None)
+            try:
+                result = self.con.execute(sql)
+                return result.fetch_arrow_table() if arrow else result.fetchdf()
+            except duckdb.Error as e:
+                raise QueryError(sql, e) from e
+
+
+_engine = None
+
+
+def get_engine():
+    """Return the process-wide QueryEngine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        _engine = QueryEngine()
+    return _engine
+
+
 def main():
     # Read the SQL query
     with open(INPUT_SQL_PATH, 'r') as f:
         user_sql = f.read()
 
-    # Open DuckDB connection
-    con = duckdb.connect()
-
-    # Read CSV and filter by date only
-    df = pd.read_csv(CSV_SOURCE_PATH)
-    
-    # Convert Date column to datetime for comparison
-    df['Date'] = pd.to_datetime(df['Date'], format='%m/%d/%Y')
-    
-    # Filter to only include dates from 4/21/2025 up to today
-    start_date = datetime(2025, 4, 21)
-    today = datetime.now()
-    df = df[(df['Date'] >= start_date) & (df['Date'] <= today)]
-    
-    # Clean Subject col from leading and trailing white spaces (but only non null values as null should be kept for record keeping)
-    df.loc[df['Subject'].notna(), 'Subject'] = df.loc[df['Subject'].notna(), 'Subject'].str.strip()
-    
-    # Replace multiple spaces between words with a single space. Crucial for filtering and grouping consistently.
-    df.loc[df['Subject'].notna(), 'Subject'] = df.loc[df['Subject'].notna(), 'Subject'].str.replace(r'\s+', ' ', regex=True)
-    # same for the Topic column
-    df.loc[df['Topic'].notna(), 'Topic'] = df.loc[df['Topic'].notna(), 'Topic'].str.strip()
-    df.loc[df['Topic'].notna(), 'Topic'] = df.loc[df['Topic'].notna(), 'Topic'].str.replace(r'\s+', ' ', regex=True)
-    
-    # Convert Date back to string format for DuckDB compatibility
-    # df['Date'] = df['Date'].dt.strftime('%Y%m/%d')
-
-
-    # Create the view in DuckDB with proper date casting
-    con.execute("CREATE OR REPLACE VIEW learned_material AS SELECT Index, Date::DATE as Date, FilePath, Subject, Topic FROM df")
-    
     try:
         # Run the query
         print("Running query...")
-        result_df = con.execute(user_sql).fetchdf()
-        
+        result_df = get_engine().query(user_sql)
+
         # Clear any previous error messages on successful execution
         with open(SQL_ERROR_PATH, 'w') as f:
             f.write("")
-        
+
         # Save result
         result_df.to_csv(OUTPUT_CSV_PATH, index=False)
         with open(OUTPUT_CSV_PATH, 'r') as f:
             print(f"Query output saved to {OUTPUT_CSV_PATH}:\n{f.read()}")
-    except Exception as e:
+    except QueryError as e:
         with open(SQL_ERROR_PATH, 'w') as f:
-            f.write(f"Error occurred:\n{e}\n")
+            f.write(str(e))
         sys.exit(1)  # Exit with error code
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+"""
+file_names.py
+=============
+Local file names for the single day files.
+
+The name is built from the subject and topic (plus the most frequent words of
+the text when they are not descriptive enough), e.g. "Python_List_Comprehensions.html".
+Names already used in the single files folder are kept in an in-memory set,
+so a clash is detected without listing the folder or asking a model, and is
+resolved by appending the date and, if needed, a counter.
+"""
+
+import os
+import re
+from collections import Counter
+
+# Words that do not describe the material
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "into", "is", "it", "its",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "which", "why", "with",
+    "about", "introduction", "intro", "basics", "overview", "notes", "part", "lesson", "some", "using", "use",
+}
+# Longest name, in words, built from the subject and topic
+MAX_WORDS = 4
+# Fewer descriptive words than this and keywords of the text are added
+MIN_WORDS = 2
+
+WORD_PATTERN = re.compile(r"[^\W_]+(?:[+#'][^\W_]*)*")
+
+
+def _words(text):
+    return [word.strip("'") for word in WORD_PATTERN.findall(text or "")]
+
+
+def keywords(subject, topic, text="", max_words=MAX_WORDS):
+    """
+    Return the descriptive words for a file name.
+
+    The words of the subject come first, followed by the words of the topic that the subject
+    does not already contain. Stopwords and repeated words are left out.
+    If fewer than MIN_WORDS remain, the most frequent words of the text are added.
+
+    Args:
+        subject (str): Subject of the material
+        topic (str): Topic of the material
+        text (str): The learned text (optional)
+        max_words (int): Maximum number of words
+
+    Returns:
+        list: The words, in order
+    """
+    chosen = []
+    seen = set()
+
+    def add(word):
+        key = word.lower()
+        if key in STOPWORDS or key in seen or (len(word) == 1 and not word.isdigit()):
+            return
+        seen.add(key)
+        chosen.append(word)
+
+    # "Python" + "Python Lists" -> Python_Lists
+    for word in _words(subject) + _words(topic):
+        add(word)
+
+    if len(chosen) < MIN_WORDS and text:
+        counts = Counter(word.lower() for word in _words(re.sub(r"<[^>]+>", " ", text))
+                         if len(word) > 3 and word.lower() not in STOPWORDS and word.lower() not in seen)
+        for word, _ in counts.most_common(max_words):
+            if len(chosen) >= MIN_WORDS:
+                break
+            add(word)
+
+    # too long: keep the subject's first word and the most specific (topic) words
+    if len(chosen) > max_words:
+        chosen = chosen[:1] + chosen[-(max_words - 1):]
+    return chosen
+
+
+def slugify(words):
+    """Join the words into a file system safe name, e.g. ["python", "lists"] -> "Python_Lists"."""
+    parts = []
+    for word in words:
+        word = re.sub(r"[^\w-]+", "", word.replace("+", "plus").replace("#", "sharp"))
+        if word:
+            # keep acronyms and mixed case words (SQL, DuckDB) as they are
+            parts.append(word if any(c.isupper() for c in word) else word.capitalize())
+    return "_".join(parts)
+
+
+class FileNameRegistry:
+    """
+    The file names already used in a folder, compared case insensitively (as on Windows).
+
+    The folder is listed once and listed again only when its modification time changes;
+    names handed out by unique_name are added right away.
+
+    Attributes:
+        folder (str): The single files folder
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        # (folder modification time, {lower case names})
+        self._cache = None
+
+    def _names(self):
+        try:
+            folder_mtime = os.stat(self.folder).st_mtime_ns
+        except FileNotFoundError:
+            folder_mtime = None
+        if self._cache is None or (folder_mtime is not None and self._cache[0] != folder_mtime):
+            names = set()
+            if folder_mtime is not None:
+                with os.scandir(self.folder) as scan:
+                    names = {entry.name.lower() for entry in scan}
+            # keep names that were handed out but not written yet
+            if self._cache is not None:
+                names |= self._cache[1]
+            self._cache = (folder_mtime, names)
+        return self._cache[1]
+
+    def __contains__(self, name):
+        return name.lower() in self._names()
+
+    def add(self, name):
+        """Record a name as used."""
+        self._names().add(name.lower())
+
+    def unique_name(self, base, date, extension=".html"):
+        """
+        Return a free file name for base and record it as used.
+
+        base.html is used if it is free, otherwise base_<date>.html, then base_<date>_2.html, ...
+
+        Args:
+            base (str): The name without extension
+            date (str): The date used to tell apart materials with the same name
+            extension (str): The file extension
+
+        Returns:
+            str: The file name
+        """
+        base = base or "Material"
+        name = f"{base}{extension}"
+        if name in self:
+            name = f"{base}_{date}{extension}"
+            counter = 2
+            while name in self:
+                name = f"{base}_{date}_{counter}{extension}"
+                counter += 1
+        self.add(name)
+        return name
+
+
+_registries = {}
+
+
+def get_registry(folder):
+    """Return the shared FileNameRegistry for a folder."""
+    key = os.path.abspath(folder)
+    if key not in _registries:
+        _registries[key] = FileNameRegistry(folder)
+    return _registries[key]
+
+
+def local_file_name(subject, topic, text, registry, date):
+    """
+    Build a unique file name for the material without calling a model.
+
+    Args:
+        subject (str): Subject of the material
+        topic (str): Topic of the material
+        text (str): The learned text
+        registry (FileNameRegistry): Names already used in the folder
+        date (str): Today's date (YYYY-MM-DD)
+
+    Returns:
+        str: The file name, e.g. "Python_List_Comprehensions.html"
+    """
+    return registry.unique_name(slugify(keywords(subject, topic, text)), date)
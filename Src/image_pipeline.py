@@ -0,0 +1,109 @@
+"""
+image_pipeline.py
+=================
+Ingest pipeline for screenshots.
+
+Screenshots are shown at 300px in the single and review files, so storing the
+full resolution image wastes megabytes per item. The pipeline downscales the
+screenshot for display, recompresses it (WebP, or optimized PNG/JPEG when WebP
+is not available), creates a small thumbnail for the review pages and keeps the
+original only when asked to. All versions go to the asset store.
+
+Pillow is optional: without it the screenshot is stored as is.
+"""
+
+import io
+from dataclasses import dataclass
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow not installed
+    Image = None
+
+# Width the images are displayed at in the HTML files
+DISPLAY_WIDTH = 300
+# The stored display image is twice the displayed width so it stays sharp on high-DPI screens
+DISPLAY_SCALE = 2
+# Width of the thumbnails shown in the review pages (the display width at 1x, so they are not upscaled)
+THUMBNAIL_WIDTH = DISPLAY_WIDTH
+
+
+@dataclass
+class ProcessedImage:
+    """Asset names of the versions of a screenshot (original is None unless it was kept)."""
+    display: str
+    thumbnail: str
+    original: str = None
+
+
+def _output_format(image_format):
+    """Pick the format to save in: WebP when Pillow supports it, otherwise the requested PNG/JPEG."""
+    if image_format == "webp" and not features.check("webp"):
+        image_format = "png"
+    return image_format
+
+
+def _encode(image, width, image_format, quality):
+    """Resize an image to at most the given width and encode it in the given format."""
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    buffer = io.BytesIO()
+    if image_format == "jpg":
+        image.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    elif image_format == "webp":
+        image.save(buffer, "WEBP", quality=quality, method=6)
+    else:
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def process_screenshot(file_path, store, display_width=DISPLAY_WIDTH * DISPLAY_SCALE,
+                       thumbnail_width=THUMBNAIL_WIDTH, image_format="webp", quality=80, keep_original=False):
+    """
+    Downscale, recompress and thumbnail a screenshot and store the results in the asset store.
+
+    Args:
+        file_path (str): Path to the screenshot
+        store (AssetStore): Asset store the images are written to
+        display_width (int): Maximum width of the display image in pixels
+        thumbnail_width (int): Maximum width of the thumbnail in pixels
+        image_format (str): "webp", "png" or "jpg"
+        quality (int): Compression quality for WebP and JPEG (1-100)
+        keep_original (bool): Also store the unmodified screenshot
+
+    Returns:
+        ProcessedImage: Asset names of the display image, thumbnail and (optionally) original
+    """
+    # without Pillow the screenshot can only be stored as is
+    if Image is None:
+        name = store.put_file(file_path)
+        return ProcessedImage(display=name, thumbnail=name, original=name if keep_original else None)
+
+    image_format = _output_format(image_format)
+    with Image.open(file_path) as image:
+        image.load()
+        display = store.put(_encode(image, display_width, image_format, quality), image_format)
+        thumbnail = store.put(_encode(image, thumbnail_width, image_format, quality), image_format)
+    original = store.put_file(file_path) if keep_original else None
+    return ProcessedImage(display=display, thumbnail=thumbnail, original=original)
+
+
+def image_html(image, store, html_dir, alt, width=DISPLAY_WIDTH):
+    """
+    Return the HTML for a processed screenshot in a file saved in html_dir.
+
+    The image links to the full size version (the original if it was kept), and is
+    lazy-loaded so pages with many images only fetch the ones scrolled into view.
+    Review pages show the thumbnail instead (see AssetStore.relink).
+
+    Args:
+        image (ProcessedImage): The processed screenshot
+        store (AssetStore): The asset store holding the images
+        html_dir (str): Folder of the HTML file
+        alt (str): Alternative text of the image
+        width (int): Width the image is displayed at
+    """
+    full_size = image.original or image.display
+    return (f'<a {store.img_attributes(full_size, html_dir, attribute="href")} target="_blank">'
+            f'<img {store.img_attributes(image.display, html_dir, image.thumbnail)} alt="{alt}" width="{width}" loading="lazy">'
+            f'</a>')
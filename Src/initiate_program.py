@@ -4,6 +4,7 @@ from IPython.display import Markdown, display, HTML
 import json
 import os
 import time
+from learned_material_store import LearnedMaterialStore
 
 # Load configuration that stores necessary paths, API keys, and other settings
 with open('config.json', "r") as f:
@@ -122,8 +123,11 @@ def create_data_file(reset=False):
                 short_date = (start_date + timedelta(days=i)).strftime("%#m/%#d/%Y")
                 # Empty placeholders for FilePath, Subject, and Topic 
                 Csv_file.write(f"{i+1},{short_date},,,\n") 
-            # If the file is created successfully, return a success message (used by the reset function to display a successful reset message)
-            return 'Created new data file'
+        # the new schedule replaces whatever the DuckDB store held (opening the store never imports
+        # a data file that is missing saved material, so the import is done explicitly here)
+        LearnedMaterialStore(data_file, sync=False).import_csv()
+        # If the file is created successfully, return a success message (used by the reset function to display a successful reset message)
+        return 'Created new data file'
 
     
 
@@ -139,10 +143,9 @@ def reset_data_file():
     """
     # checks if the data file exists (if not, there is no need to reset it)
     if os.path.exists(data_file):
-        with open(data_file, 'r') as Csv_file:
-            # check if the file contains any records of learned material which is done by looking for a C: (file path)
-            # use a generator expression to count the number of lines that contain 'C:'
-            files = sum(1 for line in Csv_file if 'C:' in line)
+        # count the records of learned material (rows with a file path) in the DuckDB store, which is kept
+        # up to date on every save (the CSV file is only rewritten when the store is exported)
+        files = int(LearnedMaterialStore(data_file).load_dataframe()['FilePath'].notna().sum())
         
         # if the file contains records, prompt the user to confirm before overwriting it
         if files > 0:
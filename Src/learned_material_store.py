@@ -0,0 +1,361 @@
+"""
+learned_material_store.py
+=========================
+Persistent DuckDB storage for the learned_material schedule.
+
+The CSV file created by initiate_program stays the interchange format, but the
+program reads and writes the DuckDB file that lives next to it
+(learned_material.duckdb). Saving material updates a single row instead of
+re-reading and re-writing the whole CSV file.
+
+Every submission is first appended to the learned_entries log (one record per
+submission, so several items can be saved on the same day) and then compacted
+into the learned_material table, usually by a background thread right after
+the save. The CSV file is not touched by saves; export_csv writes the table to
+it on demand.
+
+The CSV file is only imported again when its content differs from the last
+import/export and the database holds nothing the CSV is missing. A new
+schedule (initiate_program / reset) is imported explicitly with import_csv.
+"""
+
+import hashlib
+import os
+import threading
+import duckdb
+import numpy as np
+
+# Date format used in the CSV file (M/D/YYYY without leading zeros)
+CSV_DATE_FORMAT = "%-m/%-d/%Y"
+
+# one lock per database file, so threads of this process (e.g. background compaction
+# and a notebook cell reading the data) never open the file at the same time
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def default_database_path(csv_path):
+    """Return the path of the DuckDB file that belongs to the given CSV data file."""
+    return os.path.splitext(csv_path)[0] + ".duckdb"
+
+
+def _file_lock(db_path):
+    with _file_locks_guard:
+        return _file_locks.setdefault(os.path.abspath(db_path), threading.RLock())
+
+
+class LearnedMaterialStore:
+    """
+    Row-level storage for the learned_material table backed by a DuckDB file.
+
+    Attributes:
+        csv_path (str): Path to the CSV data file (used for import/export)
+        db_path (str): Path to the DuckDB database file
+        lock (threading.RLock): Held while a connection to the database file is open
+
+    Connections are opened per operation and closed right after, so the file lock
+    is only held for the duration of a read or write. This keeps the database
+    usable from several notebooks (Review dashboard, Query tool, Visuals) at once.
+
+    The CSV file is imported automatically the first time the store is opened. Later
+    changes to the CSV content are only imported if they do not drop saved material
+    (a touch, a OneDrive sync or saving the file in Excel never replaces the database).
+
+    Tables:
+        learned_material: one row per day of the schedule plus one extra row for every
+            additional item saved on the same day (Entry numbers the items of a day)
+        learned_entries: append-only log of every submission
+        store_meta: bookkeeping (CSV modification time and content hash, last compacted entry)
+    """
+
+    def __init__(self, csv_path, db_path=None, sync=True):
+        self.csv_path = csv_path
+        self.db_path = db_path or default_database_path(csv_path)
+        self.lock = _file_lock(self.db_path)
+        if sync:
+            self.sync_with_csv()
+
+    def _connect(self, read_only=False):
+        return duckdb.connect(self.db_path, read_only=read_only)
+
+    def _csv_mtime(self):
+        return os.path.getmtime(self.csv_path) if os.path.exists(self.csv_path) else None
+
+    def _csv_hash(self):
+        with open(self.csv_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def sync_with_csv(self):
+        """
+        Import the CSV file if the database is missing, or if the CSV content changed since the
+        last import/export and importing it would not drop any saved material.
+        """
+        csv_mtime = self._csv_mtime()
+        if csv_mtime is None:
+            return
+        with self.lock:
+            if not os.path.exists(self.db_path):
+                self.import_csv()
+                return
+            with self._connect(read_only=True) as con:
+                try:
+                    meta = dict(con.execute("SELECT key, value FROM store_meta").fetchall())
+                    has_entries = con.execute(
+                        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'learned_entries'").fetchone()[0]
+                except duckdb.CatalogException:
+                    meta, has_entries = None, 0
+            if meta is None:
+                # no bookkeeping yet: the database was never filled
+                self.import_csv()
+                return
+            # databases created before the entry log existed are upgraded in place
+            if not has_entries:
+                with self._connect() as con:
+                    self._ensure_schema(con)
+            if meta.get("csv_mtime") is not None and float(meta["csv_mtime"]) == csv_mtime:
+                return
+            # the modification time also changes without a change of content (touch, OneDrive, Excel)
+            csv_hash = self._csv_hash()
+            if csv_hash == meta.get("csv_hash"):
+                with self._connect() as con:
+                    self._record_csv_state(con)
+                return
+            missing = self._missing_from_csv()
+            if missing:
+                print(f"The data file {self.csv_path} was changed outside the program but is missing {missing} item(s) "
+                      f"saved in the database; it was not imported. export_csv writes the database to it, "
+                      f"reset_data_file starts a new schedule.", flush=True)
+                # warn once per change of the file
+                with self._connect() as con:
+                    self._record_csv_state(con)
+                return
+            self.import_csv()
+
+    def _missing_from_csv(self):
+        """Return the number of saved items (FilePath values) of the database that the CSV file does not contain."""
+        with self._connect(read_only=True) as con:
+            # entries still waiting in the log count as saved as well
+            return con.execute("""
+                SELECT COUNT(DISTINCT FilePath) FROM (
+                    SELECT FilePath FROM learned_material
+                    UNION ALL
+                    SELECT FilePath FROM learned_entries
+                    WHERE entry_id > (SELECT COALESCE(MAX(CAST(value AS BIGINT)), 0) FROM store_meta
+                                      WHERE key = 'compacted_entry_id'))
+                WHERE FilePath IS NOT NULL AND FilePath NOT IN (
+                    SELECT FilePath FROM read_csv(?, header = true, all_varchar = true) WHERE FilePath IS NOT NULL)
+            """, [self.csv_path]).fetchone()[0]
+
+    def _ensure_schema(self, con):
+        """Create the bookkeeping tables and the entry log, and add the Entry column to older databases."""
+        con.execute("CREATE TABLE IF NOT EXISTS store_meta (key VARCHAR PRIMARY KEY, value VARCHAR)")
+        con.execute("CREATE SEQUENCE IF NOT EXISTS learned_entry_ids")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS learned_entries (
+                entry_id BIGINT DEFAULT nextval('learned_entry_ids'),
+                Date DATE,
+                FilePath VARCHAR,
+                Subject VARCHAR,
+                Topic VARCHAR,
+                created_at TIMESTAMP DEFAULT current_timestamp
+            )
+        """)
+        columns = [row[0] for row in con.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'learned_material'").fetchall()]
+        if columns and "Entry" not in columns:
+            con.execute("ALTER TABLE learned_material ADD COLUMN Entry INTEGER DEFAULT 1")
+
+    def _record_csv_state(self, con):
+        con.execute("INSERT OR REPLACE INTO store_meta VALUES ('csv_mtime', ?), ('csv_hash', ?)",
+                    [str(self._csv_mtime()), self._csv_hash()])
+
+    def import_csv(self, csv_path=None):
+        """
+        Replace the contents of the learned_material table with the rows of a CSV file.
+
+        Entries in the log that were not compacted yet are dropped, the CSV file is
+        taken as the complete learning history. This is how a new schedule is started
+        (see initiate_program.create_data_file); opening the store never imports a CSV
+        file that is missing saved material.
+
+        Args:
+            csv_path (str): CSV file to import. Defaults to the store's own CSV data file.
+        """
+        csv_path = csv_path or self.csv_path
+        with self.lock, self._connect() as con:
+            # all_varchar keeps DuckDB from guessing types for the (mostly empty) text columns
+            con.execute("""
+                CREATE OR REPLACE TABLE learned_material AS
+                SELECT CAST("Index" AS INTEGER) AS "Index",
+                       strptime(Date, '%m/%d/%Y')::DATE AS Date,
+                       NULLIF(FilePath, '') AS FilePath,
+                       NULLIF(Subject, '') AS Subject,
+                       NULLIF(Topic, '') AS Topic,
+                       -- items of the same day keep the order they have in the file
+                       CAST(row_number() OVER (PARTITION BY Date ORDER BY line) AS INTEGER) AS Entry
+                FROM (SELECT *, row_number() OVER () AS line FROM read_csv(?, header = true, all_varchar = true))
+                ORDER BY 2, 6
+            """, [csv_path])
+            self._ensure_schema(con)
+            con.execute("""
+                INSERT OR REPLACE INTO store_meta
+                SELECT 'compacted_entry_id', CAST(COALESCE(MAX(entry_id), 0) AS VARCHAR) FROM learned_entries
+            """)
+            if os.path.abspath(csv_path) == os.path.abspath(self.csv_path):
+                self._record_csv_state(con)
+
+    def export_csv(self, csv_path=None):
+        """
+        Write the learned_material table to a CSV file in the original CSV layout.
+
+        Args:
+            csv_path (str): Destination file. Defaults to the store's own CSV data file.
+        """
+        csv_path = csv_path or self.csv_path
+        with self.lock:
+            # write a temporary file first, so a reader (or OneDrive) never sees half a file
+            temp_path = csv_path + ".tmp"
+            self.load_dataframe().to_csv(temp_path, index=False)
+            os.replace(temp_path, csv_path)
+            # exporting to our own CSV file must not trigger a re-import the next time the store is opened
+            if os.path.abspath(csv_path) == os.path.abspath(self.csv_path):
+                with self._connect() as con:
+                    self._record_csv_state(con)
+
+    def upsert(self, date, file_path, subject, topic):
+        """
+        Save the material of one day by updating (or inserting) the first row for that date.
+
+        Args:
+            date (datetime.date | datetime.datetime): The day the material belongs to
+            file_path (str): Path to the single HTML file
+            subject (str): Subject of the material
+            topic (str): Topic of the material
+        """
+        if hasattr(date, "date"):
+            date = date.date()
+        with self.lock, self._connect() as con:
+            updated = con.execute(
+                "UPDATE learned_material SET FilePath = ?, Subject = ?, Topic = ? WHERE Date = ? AND Entry = 1 RETURNING Date",
+                [file_path, subject, topic, date]).fetchall()
+            # dates past the end of the schedule get a new row with the next index
+            if not updated:
+                con.execute("""
+                    INSERT INTO learned_material ("Index", Date, FilePath, Subject, Topic, Entry)
+                    SELECT COALESCE(MAX("Index"), 0) + 1, ?, ?, ?, ?, 1 FROM learned_material
+                """, [date, file_path, subject, topic])
+
+    def append_entry(self, date, file_path, subject, topic):
+        """
+        Append one submission to the learned_entries log.
+
+        The entry becomes part of the learned_material table when the log is compacted
+        (see compact and compact_in_background).
+
+        Args:
+            date (datetime.date | datetime.datetime): The day the material belongs to
+            file_path (str): Path to the single HTML file
+            subject (str): Subject of the material
+            topic (str): Topic of the material
+        """
+        if hasattr(date, "date"):
+            date = date.date()
+        with self.lock, self._connect() as con:
+            con.execute("INSERT INTO learned_entries (Date, FilePath, Subject, Topic) VALUES (?, ?, ?, ?)",
+                        [date, file_path, subject, topic])
+
+    def compact(self):
+        """
+        Move the entries logged since the last compaction into the learned_material table.
+
+        The first entry of a day fills the empty placeholder row of that day. Every further
+        entry of the same day is added as a new row with the same Index and Date and the
+        next Entry number, so no submission overwrites an earlier one.
+
+        Only the rows of the new entries are written, the CSV file is left as it is
+        (see export_csv).
+
+        Returns:
+            int: The number of entries that were compacted
+        """
+        with self.lock, self._connect() as con:
+            self._ensure_schema(con)
+            row = con.execute("SELECT value FROM store_meta WHERE key = 'compacted_entry_id'").fetchone()
+            watermark = int(row[0]) if row else 0
+            entries = con.execute("""
+                SELECT entry_id, Date, FilePath, Subject, Topic FROM learned_entries
+                WHERE entry_id > ? ORDER BY entry_id
+            """, [watermark]).fetchall()
+            if not entries:
+                return 0
+            con.execute("BEGIN TRANSACTION")
+            for entry_id, date, file_path, subject, topic in entries:
+                filled = con.execute("""
+                    UPDATE learned_material SET FilePath = ?, Subject = ?, Topic = ?
+                    WHERE Date = ? AND Entry = 1 AND FilePath IS NULL RETURNING Date
+                """, [file_path, subject, topic, date]).fetchall()
+                if not filled:
+                    # same day number as the other rows of the date (next number for dates past the schedule)
+                    con.execute("""
+                        INSERT INTO learned_material ("Index", Date, FilePath, Subject, Topic, Entry)
+                        SELECT COALESCE(MAX("Index") FILTER (WHERE Date = $date), MAX("Index") + 1, 1),
+                               $date, $file_path, $subject, $topic,
+                               COALESCE(MAX(Entry) FILTER (WHERE Date = $date), 0) + 1
+                        FROM learned_material
+                    """, {"date": date, "file_path": file_path, "subject": subject, "topic": topic})
+            con.execute("INSERT OR REPLACE INTO store_meta VALUES ('compacted_entry_id', ?)", [str(entries[-1][0])])
+            con.execute("COMMIT")
+            return len(entries)
+
+    def compact_in_background(self):
+        """
+        Compact the entry log in a daemon thread.
+
+        Returns:
+            threading.Thread: The started thread (join it to wait for the compaction)
+        """
+        thread = threading.Thread(target=self.compact, name="learned-entries-compaction", daemon=True)
+        thread.start()
+        return thread
+
+    def load_dataframe(self, csv_dates=True):
+        """
+        Load the learned_material table as a DataFrame matching pd.read_csv of the CSV data file.
+
+        Entries still waiting in the log are compacted first, so the result always includes
+        every submission.
+
+        Args:
+            csv_dates (bool): If True (default) the Date column holds M/D/YYYY strings like the CSV file.
+                              If False it is returned as datetime64 so callers can skip date parsing.
+
+        Returns:
+            pd.DataFrame: Columns Index, Date, FilePath, Subject, Topic with NaN for empty values
+        """
+        date_column = f"strftime(Date, '{CSV_DATE_FORMAT}')" if csv_dates else "Date::TIMESTAMP"
+        with self.lock:
+            self.compact()
+            with self._connect(read_only=True) as con:
+                df = con.execute(f"""
+                    SELECT "Index", {date_column} AS Date, FilePath, Subject, Topic
+                    FROM learned_material
+                    ORDER BY learned_material.Date, "Index", Entry
+                """).fetchdf()
+        # DuckDB returns None for NULL strings, the rest of the program expects NaN like read_csv gives
+        text_columns = ["FilePath", "Subject", "Topic"]
+        df[text_columns] = df[text_columns].astype(object).where(df[text_columns].notna(), np.nan)
+        return df
+
+    def version(self):
+        """
+        Return a cheap fingerprint of the stored data that changes whenever the database file is written.
+
+        Returns:
+            tuple: (modification time in ns, size in bytes) of the database file and its write-ahead log
+        """
+        version = ()
+        for path in (self.db_path, self.db_path + ".wal"):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                version += (stat.st_mtime_ns, stat.st_size)
+        return version
@@ -0,0 +1,141 @@
+"""
+llm_cache.py
+============
+Persistent cache of LLM responses.
+
+Many prompts are sent again with exactly the same text: spell checking a
+subject that was typed before, converting unchanged text to HTML, asking the
+same question in the Query tool. ResponseCache stores each response in a
+SQLite file under a key made from the model, the system role, the prompt and
+the sampling parameters, so a repeated prompt is answered from disk instead
+of the API.
+
+Entries expire after a time to live and the least recently used entries are
+evicted when the cache grows past its size limit. Error responses are never
+cached.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Default cache file (Data/Cache/llm_cache.sqlite in the project folder)
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "Cache", "llm_cache.sqlite")
+# Entries older than this are ignored and removed (30 days)
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+# Maximum number of responses kept
+DEFAULT_MAX_ENTRIES = 5000
+
+
+class ResponseCache:
+    """
+    SQLite backed LLM response cache with a time to live and LRU eviction.
+
+    Attributes:
+        path (str): Path to the SQLite file
+        ttl_seconds (int): Seconds a response stays valid
+        max_entries (int): Number of responses kept before the least recently used ones are evicted
+        hits (int): Number of lookups answered from the cache in this session
+        misses (int): Number of lookups that had to go to the API in this session
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # one connection shared by the threads of this process, guarded by the lock
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._con.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._con.commit()
+
+    @staticmethod
+    def make_key(**params):
+        """Return the cache key for a request (hash of the model, system role, prompt and sampling parameters)."""
+        return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached response for a key, or None if there is none or it expired.
+
+        Args:
+            key (str): Key from make_key
+        """
+        now = time.time()
+        with self._lock:
+            row = self._con.execute("SELECT response, created_at FROM responses WHERE key = ?", [key]).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._con.execute("DELETE FROM responses WHERE key = ?", [key])
+                    self._con.commit()
+                self.misses += 1
+                return None
+            self._con.execute("UPDATE responses SET last_used = ? WHERE key = ?", [now, key])
+            self._con.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        """
+        Store a response and evict the least recently used entries beyond max_entries.
+
+        Args:
+            key (str): Key from make_key
+            response (str): The response text
+        """
+        now = time.time()
+        with self._lock:
+            self._con.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", [key, response, now, now])
+            self._con.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, [self.max_entries])
+            self._con.commit()
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._con.execute("DELETE FROM responses")
+            self._con.commit()
+
+    def stats(self):
+        """
+        Return the cache statistics.
+
+        Returns:
+            dict: hits and misses of this session, number of stored entries and the hit rate
+        """
+        with self._lock:
+            entries = self._con.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": entries,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+# one cache per file, shared by every client in the session
+_caches = {}
+_caches_guard = threading.Lock()
+
+
+def get_cache(path=DEFAULT_CACHE_PATH):
+    """Return the shared ResponseCache for a cache file."""
+    path = os.path.abspath(path)
+    with _caches_guard:
+        if path not in _caches:
+            _caches[path] = ResponseCache(path)
+        return _caches[path]
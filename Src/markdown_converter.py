@@ -0,0 +1,378 @@
+"""
+markdown_converter.py
+=====================
+Local Markdown (or plain text) to HTML conversion for the learned text.
+
+Converting the text of a submission used to be an LLM call on every save. This
+converter does it locally and deterministically: the same text always gives
+the same HTML, without a network round trip. It supports
+
+- headings (#), paragraphs (line breaks are kept), horizontal rules
+- bold, italic, strikethrough, inline code, links, images and bare URLs
+- nested bulleted and numbered lists, block quotes
+- fenced code blocks (``` or ~~~, with an optional language)
+- pipe tables with column alignment
+- math passthrough: $...$, $$...$$, \\(...\\) and \\[...\\] are left untouched for MathJax/KaTeX
+
+HTML typed into the text is kept if it only uses harmless tags; everything
+else (scripts, event handlers, javascript: links, unknown tags) is escaped or
+removed by sanitize_html, which is also applied to HTML coming from the LLM.
+"""
+
+import html
+import re
+from html.parser import HTMLParser
+
+# ===== SANITIZING =====
+# Tags that may appear in the converted HTML, with the attributes they may keep
+ALLOWED_TAGS = {
+    "a": {"href", "title", "target"},
+    "img": {"src", "alt", "title", "width", "height"},
+    "code": {"class"},
+    "th": {"style"}, "td": {"style"},
+    "span": {"class"}, "div": {"class"},
+    **{tag: set() for tag in (
+        "p", "br", "hr", "h1", "h2", "h3", "h4", "h5", "h6", "strong", "b", "em", "i", "u", "s", "del",
+        "sub", "sup", "mark", "kbd", "small", "pre", "blockquote", "ul", "ol", "li", "dl", "dt", "dd",
+        "table", "thead", "tbody", "tr", "caption")},
+}
+VOID_TAGS = {"br", "hr", "img"}
+# Tags whose content is dropped together with the tag
+DROP_CONTENT_TAGS = {"script", "style", "iframe", "object", "embed", "template"}
+SAFE_URL = re.compile(r"^(https?:|mailto:|#|/|\.|[^:]*$)", re.I)
+SAFE_STYLE = re.compile(r"^\s*text-align:\s*(left|right|center)\s*;?\s*$", re.I)
+
+
+class _Sanitizer(HTMLParser):
+    """Rebuilds HTML keeping only ALLOWED_TAGS with their allowed attributes; other tags are shown as text."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping:
+            return
+        if tag not in ALLOWED_TAGS:
+            self.out.append(html.escape(self.get_starttag_text()))
+            return
+        kept = []
+        for name, value in attrs:
+            value = value or ""
+            if name not in ALLOWED_TAGS[tag]:
+                continue
+            if name in ("href", "src") and not SAFE_URL.match(value.strip()):
+                continue
+            if name == "style" and not SAFE_STYLE.match(value):
+                continue
+            kept.append(f' {name}="{html.escape(value)}"')
+        if tag == "a" and any(part.startswith(' target=') for part in kept):
+            kept.append(' rel="noopener"')
+        self.out.append(f"<{tag}{''.join(kept)}>")
+        if tag not in VOID_TAGS:
+            # remember where the tag was written so it can be shown as text if it is never closed
+            self.open_tags.append((tag, len(self.out) - 1, self.get_starttag_text()))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in ALLOWED_TAGS and tag not in VOID_TAGS and self.open_tags and self.open_tags[-1][0] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping:
+            return
+        if tag not in ALLOWED_TAGS:
+            self.out.append(html.escape(f"</{tag}>"))
+            return
+        if any(open_tag == tag for open_tag, _, _ in self.open_tags):
+            # tags opened inside this one that were never closed were text such as "a<b c", not HTML
+            while self.open_tags:
+                open_tag, position, raw = self.open_tags.pop()
+                if open_tag == tag:
+                    self.out.append(f"</{tag}>")
+                    break
+                self.out[position] = html.escape(raw)
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(html.escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        for _, position, raw in self.open_tags:
+            self.out[position] = html.escape(raw)
+        return "".join(self.out)
+
+
+def sanitize_html(fragment):
+    """
+    Return an HTML fragment reduced to safe tags and attributes.
+
+    Unknown tags are escaped so their text stays visible, scripts and styles are removed,
+    and links/images may only point to http(s), mailto or relative URLs.
+    """
+    sanitizer = _Sanitizer()
+    sanitizer.feed(fragment)
+    return sanitizer.result()
+
+
+# ===== INLINE MARKDOWN =====
+MATH_PATTERN = re.compile(r"\$\$.+?\$\$|\\\[.+?\\\]|\\\(.+?\\\)|(?<![\w$\\])\$(?=\S)[^$\n]+?(?<=\S)\$(?![\w$])", re.S)
+CODE_SPAN_PATTERN = re.compile(r"(`+)(.+?)\1", re.S)
+ESCAPED_CHARACTER = re.compile(r"\\([\\`*_{}\[\]()#+\-.!|~>$])")
+PLACEHOLDER = "\x00{}\x00"
+# Link and image destinations may contain balanced parentheses (two levels deep), as in CommonMark:
+# [Python](https://en.wikipedia.org/wiki/Python_(programming_language))
+DESTINATION = r"((?:[^\s()]|\((?:[^\s()]|\([^\s()]*\))*\))+?)"
+# Bare URLs end before trailing punctuation, but keep a closing parenthesis that has its opening one
+BARE_URL = r"(https?://(?:[^\s<>\"'()]|\([^\s<>\"'()]*\))*(?:[^\s<>\"'().,;:!?]|\([^\s<>\"'()]*\)))"
+# A "<" that does not start a complete tag the sanitizer knows (or a comment or an <https://...> link)
+# is text, as in "if x<y then stop"; left raw, the HTML parser would read it as a tag running into </p>
+STRAY_BRACKET = re.compile(r"<(?!/?(?:" + "|".join(sorted(set(ALLOWED_TAGS) | DROP_CONTENT_TAGS))
+                           + r")\b[^<>]*>|!--|https?://[^\s>]+>)", re.I)
+
+
+def _inline(text):
+    """Convert the inline Markdown of a block of text."""
+    protected = []
+
+    def protect(fragment):
+        protected.append(fragment)
+        return PLACEHOLDER.format(len(protected) - 1)
+
+    # code spans and math are not touched by the other rules
+    text = CODE_SPAN_PATTERN.sub(lambda m: protect(f"<code>{html.escape(m.group(2).strip())}</code>"), text)
+    text = MATH_PATTERN.sub(lambda m: protect(html.escape(m.group(0), quote=False)), text)
+    text = ESCAPED_CHARACTER.sub(lambda m: protect(html.escape(m.group(1))), text)
+    text = STRAY_BRACKET.sub("&lt;", text)
+
+    # images and links (before bare URLs so their URLs are not linked twice)
+    text = re.sub(r"!\[([^\]]*)\]\(\s*" + DESTINATION + r"(?:\s+\"([^\"]*)\")?\s*\)",
+                  lambda m: protect(f'<img src="{html.escape(m.group(2))}" alt="{html.escape(m.group(1))}"'
+                                    + (f' title="{html.escape(m.group(3))}"' if m.group(3) else "") + ">"), text)
+    text = re.sub(r"\[([^\]]+)\]\(\s*" + DESTINATION + r"(?:\s+\"([^\"]*)\")?\s*\)",
+                  lambda m: protect(f'<a href="{html.escape(m.group(2))}" target="_blank">') + m.group(1) + protect("</a>"),
+                  text)
+    text = re.sub(r"<(https?://[^\s>]+)>",
+                  lambda m: protect(f'<a href="{html.escape(m.group(1))}" target="_blank">{html.escape(m.group(1))}</a>'), text)
+    text = re.sub(r"(?<![\"'=(\w])" + BARE_URL,
+                  lambda m: protect(f'<a href="{html.escape(m.group(1))}" target="_blank">{html.escape(m.group(1))}</a>'), text)
+
+    # emphasis (underscores only at word boundaries so snake_case stays as it is)
+    text = re.sub(r"\*\*(?=\S)(.+?)(?<=\S)\*\*", r"<strong>\1</strong>", text, flags=re.S)
+    text = re.sub(r"(?<!\w)__(?=\S)(.+?)(?<=\S)__(?!\w)", r"<strong>\1</strong>", text, flags=re.S)
+    text = re.sub(r"(?<![*\w])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![*\w])", r"<em>\1</em>", text, flags=re.S)
+    text = re.sub(r"(?<!\w)_(?=[^\s_])(.+?)(?<=[^\s_])_(?!\w)", r"<em>\1</em>", text, flags=re.S)
+    text = re.sub(r"~~(?=\S)(.+?)(?<=\S)~~", r"<del>\1</del>", text, flags=re.S)
+
+    # line breaks inside a paragraph are kept (plain text notes rely on them)
+    text = re.sub(r"(?: {2,}|\\)?\n", "<br>\n", text)
+
+    while "\x00" in text:
+        text = re.sub(r"\x00(\d+)\x00", lambda m: protected[int(m.group(1))], text)
+    return text
+
+
+# ===== BLOCK MARKDOWN =====
+FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})\s*([\w+#.-]*)")
+HEADING = re.compile(r"^ {0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+RULE = re.compile(r"^ {0,3}([-*_])(\s*\1){2,}\s*$")
+LIST_ITEM = re.compile(r"^( *)([-*+]|\d{1,9}[.)])\s+(.*)$")
+QUOTE = re.compile(r"^ {0,3}> ?(.*)$")
+TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{1,}:?\s*(\|\s*:?-{1,}:?\s*)*\|?\s*$")
+MATH_BLOCK_START = re.compile(r"^\s*(\$\$|\\\[)")
+HTML_BLOCK = re.compile(r"^\s*</?(p|div|table|ul|ol|li|h[1-6]|pre|blockquote|dl|hr|br|img|section|details|summary)\b", re.I)
+
+
+def _split_row(line):
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in re.split(r"(?<!\\)\|", line)]
+
+
+def _table(lines):
+    header = _split_row(lines[0])
+    alignments = []
+    for cell in _split_row(lines[1]):
+        if cell.startswith(":") and cell.endswith(":"):
+            alignments.append("center")
+        elif cell.endswith(":"):
+            alignments.append("right")
+        elif cell.startswith(":"):
+            alignments.append("left")
+        else:
+            alignments.append(None)
+
+    def row(cells, tag):
+        out = []
+        for i, cell in enumerate(cells):
+            align = alignments[i] if i < len(alignments) else None
+            style = f' style="text-align: {align}"' if align else ""
+            out.append(f"<{tag}{style}>{_inline(cell)}</{tag}>")
+        return "<tr>" + "".join(out) + "</tr>"
+
+    body = [row(_split_row(line), "td") for line in lines[2:]]
+    return ("<table>\n<thead>" + row(header, "th") + "</thead>\n"
+            + ("<tbody>\n" + "\n".join(body) + "\n</tbody>\n" if body else "") + "</table>")
+
+
+def _list(lines, start):
+    """Convert the list starting at lines[start]; return (html, index of the first line after the list)."""
+    indent, marker, _ = LIST_ITEM.match(lines[start]).groups()
+    ordered = marker[0].isdigit()
+    items = []
+    i = start
+    while i < len(lines):
+        match = LIST_ITEM.match(lines[i])
+        if match and len(match.group(1)) == len(indent) and match.group(2)[0].isdigit() == ordered:
+            items.append([match.group(3)])
+            i += 1
+        elif lines[i].strip() == "":
+            # a blank line ends the list unless the next line continues it
+            following = lines[i + 1] if i + 1 < len(lines) else ""
+            if following.startswith(indent + " ") or (LIST_ITEM.match(following) and
+                                                       len(LIST_ITEM.match(following).group(1)) == len(indent)):
+                items[-1].append("")
+                i += 1
+            else:
+                break
+        elif lines[i].startswith(indent + " ") or not lines[i].startswith(" ") and not LIST_ITEM.match(lines[i]) \
+                and not _starts_block(lines[i]):
+            # continuation (nested list or wrapped text), with the item's indentation removed
+            items[-1].append(re.sub(r"^ {0,%d}" % (len(indent) + 4), "", lines[i]))
+            i += 1
+        else:
+            break
+
+    tag = "ol" if ordered else "ul"
+    start_number = int(marker[:-1]) if ordered else 1
+    opening = f'<{tag} start="{start_number}">' if ordered and start_number != 1 else f"<{tag}>"
+    rendered = []
+    for item in items:
+        content = _blocks(item)
+        # a single paragraph is shown without <p> so tight lists keep their spacing
+        if content.startswith("<p>") and content.count("<p>") == 1:
+            content = content[3:].replace("</p>", "", 1)
+        rendered.append(f"<li>{content}</li>")
+    return opening + "\n" + "\n".join(rendered) + f"\n</{tag}>", i
+
+
+def _starts_block(line):
+    return bool(FENCE.match(line) or HEADING.match(line) or RULE.match(line) or QUOTE.match(line)
+                or MATH_BLOCK_START.match(line) or HTML_BLOCK.match(line))
+
+
+def _blocks(lines):
+    """Convert a list of lines into block level HTML."""
+    out = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+
+        fence = FENCE.match(line)
+        if fence:
+            closing = re.compile(r"^ {0,3}" + re.escape(fence.group(1)[0]) + "{" + str(len(fence.group(1))) + r",}\s*$")
+            code = []
+            i += 1
+            while i < len(lines) and not closing.match(lines[i]):
+                code.append(lines[i])
+                i += 1
+            i += 1
+            language = f' class="language-{html.escape(fence.group(2))}"' if fence.group(2) else ""
+            out.append(f"<pre><code{language}>{html.escape(chr(10).join(code))}</code></pre>")
+            continue
+
+        if MATH_BLOCK_START.match(line):
+            # display math is passed through untouched until its closing delimiter
+            closing = "$$" if line.strip().startswith("$$") else "\\]"
+            math = [line]
+            rest = line.strip()[2:]
+            while closing not in rest and i + 1 < len(lines):
+                i += 1
+                math.append(lines[i])
+                rest = lines[i]
+            i += 1
+            out.append(f'<div class="math">{html.escape(chr(10).join(math), quote=False)}</div>')
+            continue
+
+        heading = HEADING.match(line)
+        if heading:
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+            i += 1
+            continue
+
+        if RULE.match(line):
+            out.append("<hr>")
+            i += 1
+            continue
+
+        if QUOTE.match(line):
+            quoted = []
+            while i < len(lines) and lines[i].strip() and QUOTE.match(lines[i]):
+                quoted.append(QUOTE.match(lines[i]).group(1))
+                i += 1
+            out.append("<blockquote>\n" + _blocks(quoted) + "\n</blockquote>")
+            continue
+
+        if LIST_ITEM.match(line):
+            rendered, i = _list(lines, i)
+            out.append(rendered)
+            continue
+
+        if "|" in line and i + 1 < len(lines) and TABLE_SEPARATOR.match(lines[i + 1]) and "-" in lines[i + 1]:
+            table = [line, lines[i + 1]]
+            i += 2
+            while i < len(lines) and lines[i].strip() and "|" in lines[i]:
+                table.append(lines[i])
+                i += 1
+            out.append(_table(table))
+            continue
+
+        if HTML_BLOCK.match(line):
+            # HTML typed by the user (or generated content) is kept as is and sanitized afterwards
+            block = []
+            while i < len(lines) and lines[i].strip():
+                block.append(lines[i])
+                i += 1
+            out.append(STRAY_BRACKET.sub("&lt;", "\n".join(block)))
+            continue
+
+        # paragraph: everything up to a blank line or the start of another block
+        paragraph = [line]
+        i += 1
+        while i < len(lines) and lines[i].strip() and not _starts_block(lines[i]) and not LIST_ITEM.match(lines[i]):
+            paragraph.append(lines[i])
+            i += 1
+        out.append(f"<p>{_inline(chr(10).join(paragraph))}</p>")
+    return "\n".join(out)
+
+
+def markdown_to_html(text):
+    """
+    Convert Markdown or plain text to sanitized HTML.
+
+    Args:
+        text (str): The learned text (Markdown, plain text or simple HTML)
+
+    Returns:
+        str: The HTML fragment (empty string for empty text)
+    """
+    if not text or not text.strip():
+        return ""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").expandtabs(4).split("\n")
+    return sanitize_html(_blocks(lines))
@@ -0,0 +1,185 @@
+"""
+material_sidecar.py
+===================
+Structured sidecar files for the single files.
+
+Every saved item gets a small JSON file next to the single files folder
+(Data/Sidecars/<path of the single file relative to Data>.json, e.g.
+Single_Day_Files%2Fpython_decorators.html.json) holding the parts of the item that are
+read again later: the text HTML, its plain text, the links, the image asset
+names, the metadata and the content section copied into the review files.
+The review file and the summary/quiz tool read the sidecar instead of opening
+the whole single file (CSS included) and searching it for markers.
+
+Single files saved before sidecars existed are parsed once with the old
+markers and a sidecar is written for them, so the next read is fast too.
+"""
+
+import html
+import json
+import os
+import re
+from dataclasses import asdict
+from urllib.parse import quote
+from asset_store import ASSET_REFERENCE_PATTERN
+from image_pipeline import ProcessedImage
+
+# Markers of the content section in the single files
+TEXT_START = '<div id="text">'
+TEXT_END = '</div><br>'
+SECTION_END = '<p id="end">'
+
+
+def default_sidecars_path(single_files_path):
+    """Return the default sidecar folder: a Sidecars folder next to the single files folder."""
+    return os.path.join(os.path.dirname(os.path.normpath(single_files_path)), "Sidecars")
+
+
+def html_to_text(fragment):
+    """Return the plain text of an HTML fragment (tags removed, entities decoded, whitespace collapsed)."""
+    text = re.sub(r"<(script|style)\b.*?</\1>", " ", fragment, flags=re.S | re.I)
+    text = re.sub(r"<br\s*/?>|</(p|div|li|h[1-6]|tr)>", "\n", text, flags=re.I)
+    text = html.unescape(re.sub(r"<[^>]+>", " ", text))
+    lines = (re.sub(r"[ \t\r\f\v]+", " ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+class SidecarStore:
+    """
+    Sidecar files of the single files, one JSON file per single file.
+
+    Attributes:
+        root (str): Folder that holds the sidecar files
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, html_path):
+        """
+        Return the sidecar path of a single file.
+
+        The sidecar is named after the path of the file relative to the folder that holds the
+        sidecar folder (the Data folder), so files with the same name in different folders get
+        different sidecars. Files outside that folder use their file name.
+        """
+        base = os.path.dirname(os.path.abspath(self.root))
+        try:
+            relative = os.path.relpath(os.path.abspath(html_path), base)
+        except ValueError:
+            # on Windows there is no relative path between two drives
+            relative = os.pardir
+        if relative.startswith(os.pardir):
+            relative = os.path.basename(html_path)
+        return os.path.join(self.root, quote(relative.replace(os.sep, "/"), safe="") + ".json")
+
+    def _legacy_path_for(self, html_path):
+        """Sidecars used to be named after the file name only."""
+        return os.path.join(self.root, os.path.basename(html_path) + ".json")
+
+    def write(self, html_path, subject, topic, date, text_html, section_html, links=(), image=None):
+        """
+        Write the sidecar of a single file.
+
+        Args:
+            html_path (str): Path to the single HTML file
+            subject (str): Subject of the material
+            topic (str): Topic of the material
+            date (str): Date the material was saved (MM/DD/YYYY)
+            text_html (str): The learned text converted to HTML
+            section_html (str): The content section of the single file (text, image and links)
+            links (list): The related links
+            image (ProcessedImage): The screenshot in the asset store, if there is one
+
+        Returns:
+            dict: The sidecar content
+        """
+        sidecar = {
+            "file": html_path,
+            "subject": subject,
+            "topic": topic,
+            "date": date,
+            "text_html": text_html,
+            "plain_text": html_to_text(text_html),
+            "links": [link.strip() for link in links],
+            "images": [asdict(image)] if image is not None else [],
+            "section_html": section_html,
+        }
+        path = self.path_for(html_path)
+        # write to a temporary file first so a crash never leaves a half written sidecar behind
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(sidecar, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return sidecar
+
+    def load(self, html_path):
+        """
+        Return the sidecar of a single file, creating it from the HTML file if it does not exist yet.
+
+        Args:
+            html_path (str): Path to the single HTML file
+
+        Returns:
+            dict: The sidecar content (see write)
+        """
+        path = self.path_for(html_path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        # a sidecar written under the old name is renamed if it belongs to this file
+        legacy_path = self._legacy_path_for(html_path)
+        if legacy_path != path and os.path.exists(legacy_path):
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                sidecar = json.load(f)
+            if sidecar.get("file") == html_path:
+                os.replace(legacy_path, path)
+                return sidecar
+        return self._from_legacy_file(html_path)
+
+    def _from_legacy_file(self, html_path):
+        """Parse a single file saved without a sidecar and write the sidecar for it."""
+        with open(html_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        section_start = content.find(TEXT_START)
+        section_end = content.find(SECTION_END, section_start)
+        section_html = content[section_start:section_end + len(SECTION_END)]
+
+        text_end = content.find(TEXT_END, section_start)
+        text_html = content[section_start + len(TEXT_START):text_end]
+        # very old files have the screenshot embedded as base64 right after the text
+        base64_pos = text_html.find("png;base64")
+        if base64_pos != -1:
+            text_html = text_html[:base64_pos]
+
+        title = re.search(r"<h1>(.*?): (.*?)</h1>", content, re.S)
+        date = re.search(r"<div id=date>(.*?)</div>", content, re.S)
+        links = re.findall(r'<li><a href="([^"]*)" target="_blank">', content[text_end:])
+        # the screenshot link (href) points to the original when it was kept, the image (src) to the display version
+        references = {attribute: (name, thumbnail) for attribute, name, thumbnail in ASSET_REFERENCE_PATTERN.findall(section_html)}
+        image = None
+        if "src" in references:
+            display, thumbnail = references["src"]
+            original = references.get("href", (display,))[0]
+            image = ProcessedImage(display=display, thumbnail=thumbnail or display,
+                                   original=original if original != display else None)
+        return self.write(html_path,
+                          subject=html.unescape(title.group(1)) if title else None,
+                          topic=html.unescape(title.group(2)) if title else None,
+                          date=date.group(1) if date else None,
+                          text_html=text_html,
+                          section_html=section_html,
+                          links=links,
+                          image=image)
+
+
+def load_sidecar(html_path, root=None):
+    """
+    Return the sidecar of a single file.
+
+    Args:
+        html_path (str): Path to the single HTML file
+        root (str): Sidecar folder. Defaults to the Sidecars folder next to the file's folder.
+    """
+    return SidecarStore(root or default_sidecars_path(os.path.dirname(html_path))).load(html_path)
@@ -0,0 +1,252 @@
+"""
+query_cache.py
+==============
+Cache of the SQL generated for natural language questions.
+
+The same analytics questions are asked again and again ("what did I learn
+about python last month"), each time costing a reasoning-model call. The
+cache stores the generated SQL under the normalized question and its purpose
+("query" or "summary"):
+
+- case, punctuation, white space, plural "s" and filler words ("what", "did",
+  "I", "show me", ...) do not matter; word order does ("python topics not in
+  math" and "math topics not in python" ask for different data)
+- optionally, a question whose words match a cached one's nearly word for word
+  (in the same order, with the same numbers) is answered with its SQL as well
+  (fuzzy matching)
+- for relative date questions ("last month", "past 3 weeks", "today") dates
+  written into the SQL are stored relative to the day the SQL was generated,
+  so the cached query keeps covering the same period on later days. Questions
+  that name a date ("since 2025-05-01", "in March 2026") are never templated.
+- entries belong to a vocabulary version (the schema and the list of subjects)
+  and are dropped when a column or a subject is added, since e.g. "science
+  subjects" then has to be answered differently
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+from difflib import SequenceMatcher
+
+# Default cache file (next to the response cache)
+DEFAULT_QUERY_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "Cache",
+                                        "nl_sql_cache.json")
+# Version of the key format, caches written with another format are dropped
+CACHE_FORMAT = 2
+# Maximum number of questions kept (the least recently used ones are dropped)
+MAX_ENTRIES = 500
+# Share of words (in order) a question needs to have in common with a cached one when fuzzy matching is on
+FUZZY_THRESHOLD = 0.85
+
+# Words that do not change what a question asks for
+STOPWORDS = {
+    "a", "an", "the", "what", "which", "did", "do", "does", "i", "me", "my", "mine", "we", "our", "you", "can",
+    "could", "would", "please", "show", "give", "list", "get", "find", "display", "tell", "see", "all", "any",
+    "about", "of", "on", "in", "for", "to", "from", "with", "that", "is", "are", "was", "were", "be", "been",
+    "have", "has", "had", "learn", "learned", "learnt", "study", "studied", "material", "materials", "stuff",
+    "thing", "things", "everything", "some", "there", "and", "during", "over", "at", "by",
+}
+# Questions with one of these words are about a period relative to today
+RELATIVE_DATE_WORDS = re.compile(r"\b(today|yesterday|last|past|previous|this|recent|recently|ago|since|current)\b", re.I)
+# Dates written in a question (2025-05-01, 5/1/2025, a year, a month name), which stay the same on later days
+EXPLICIT_DATE = re.compile(r"\b(\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/.]\d{1,2}[/.]\d{2,4}|(19|20)\d{2}|jan(uary)?|feb(ruary)?|mar(ch)?|"
+                           r"apr(il)?|may(?=\s+\d)|june?|july?|aug(ust)?|sep(t|tember)?|oct(ober)?|nov(ember)?|dec(ember)?)\b",
+                           re.I)
+# Date literals in generated SQL ('2026-09-18' or DATE '2026-09-18')
+DATE_LITERAL = re.compile(r"'(\d{4}-\d{2}-\d{2})'")
+DATE_PLACEHOLDER = re.compile(r"'\{today([+-]\d+)\}'")
+
+
+def normalize_question(question):
+    """
+    Return the words of a question that matter for the SQL, in the order they were asked.
+
+    Example:
+        >>> normalize_question("What did I learn about Python last month?")
+        'python last month'
+    """
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    words = [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+             for word in words if word not in STOPWORDS]
+    return " ".join(words)
+
+
+def has_explicit_date(question):
+    """True if the question names a date, a month or a year."""
+    return bool(EXPLICIT_DATE.search(question))
+
+
+def is_relative(question):
+    """True if the question asks about a period relative to today (and names no date of its own)."""
+    return bool(RELATIVE_DATE_WORDS.search(question)) and not has_explicit_date(question)
+
+
+def to_template(sql, today=None):
+    """Replace the date literals of a query with placeholders relative to today ('{today-30}')."""
+    today = today or date.today()
+
+    def placeholder(match):
+        try:
+            day = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+        except ValueError:
+            return match.group(0)
+        return "'{today%+d}'" % (day - today).days
+
+    return DATE_LITERAL.sub(placeholder, sql)
+
+
+def from_template(template, today=None):
+    """Fill the date placeholders of a query template in for today."""
+    today = today or date.today()
+    return DATE_PLACEHOLDER.sub(lambda m: f"'{today + timedelta(days=int(m.group(1))):%Y-%m-%d}'", template)
+
+
+class QueryCache:
+    """
+    Persistent cache from (normalized question, purpose) to generated SQL.
+
+    Attributes:
+        path (str): JSON file the cache is kept in
+        hits (int): Questions answered from the cache in this session
+        misses (int): Questions that needed the model in this session
+    """
+
+    def __init__(self, path=DEFAULT_QUERY_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            self._data = {"format": CACHE_FORMAT, "vocabulary": None, "entries": {}}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    # older caches stored the words of a question sorted, their keys can mix up questions
+                    if data.get("format") == CACHE_FORMAT:
+                        self._data = data
+                except ValueError:
+                    pass
+        return self._data
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def _entries(self, vocabulary):
+        data = self._load()
+        if data["vocabulary"] != vocabulary:
+            # a column or subject was added: every cached query may be out of date
+            data["vocabulary"] = vocabulary
+            data["entries"] = {}
+        return data["entries"]
+
+    @staticmethod
+    def _key(normalized, purpose):
+        return f"{purpose}|{normalized}"
+
+    def _fuzzy_match(self, entries, normalized, purpose):
+        words = normalized.split()
+        numbers = [word for word in words if word.isdigit()]
+        best, best_score = None, 0
+        for key, entry in entries.items():
+            cached_purpose, cached_question = key.split("|", 1)
+            cached_words = cached_question.split()
+            # "2025" and "2026" or "3 weeks" and "6 weeks" ask for different data
+            if cached_purpose != purpose or [word for word in cached_words if word.isdigit()] != numbers:
+                continue
+            # words are compared in order, a swapped "python ... not ... math" does not match
+            score = SequenceMatcher(None, words, cached_words, autojunk=False).ratio()
+            if score > best_score:
+                best, best_score = entry, score
+        return best if best_score >= FUZZY_THRESHOLD else None
+
+    def get(self, question, purpose, vocabulary, fuzzy=False):
+        """
+        Return the cached SQL for a question, or None.
+
+        Args:
+            question (str): The question as the user typed it
+            purpose (str): "query" or "summary"
+            vocabulary (str): Current vocabulary version (see vocabulary_version)
+            fuzzy (bool): Also accept a cached question sharing at least FUZZY_THRESHOLD of its words
+                          in the same order (and all its numbers)
+        """
+        normalized = normalize_question(question)
+        with self._lock:
+            entries = self._entries(vocabulary)
+            entry = entries.get(self._key(normalized, purpose))
+            if entry is None and fuzzy:
+                entry = self._fuzzy_match(entries, normalized, purpose)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["last_used"] = datetime.now().isoformat(timespec="seconds")
+        return from_template(entry["sql"]) if entry["relative"] else entry["sql"]
+
+    def put(self, question, purpose, vocabulary, sql):
+        """Store the SQL generated for a question (only queries that ran successfully should be stored)."""
+        relative = is_relative(question)
+        with self._lock:
+            entries = self._entries(vocabulary)
+            entries[self._key(normalize_question(question), purpose)] = {
+                "question": question,
+                "sql": to_template(sql) if relative else sql,
+                "relative": relative,
+                "last_used": datetime.now().isoformat(timespec="seconds"),
+            }
+            if len(entries) > MAX_ENTRIES:
+                for key in sorted(entries, key=lambda k: entries[k]["last_used"])[:len(entries) - MAX_ENTRIES]:
+                    del entries[key]
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._data = {"format": CACHE_FORMAT, "vocabulary": None, "entries": {}}
+            self._save()
+
+
+# data version of the engine -> vocabulary version
+_vocabulary_versions = {}
+
+
+def vocabulary_version(engine=None):
+    """
+    Return a hash of the learned_material columns and the distinct subjects.
+
+    It changes when a column or a new subject is added, but not when another topic is saved
+    under an existing subject. Computed once per data version of the engine.
+    """
+    if engine is None:
+        from duck_database_runner import get_engine
+        engine = get_engine()
+    data_version = engine.data_version()
+    if data_version not in _vocabulary_versions:
+        columns = engine.query("DESCRIBE learned_material")["column_name"].tolist()
+        subjects = engine.query("SELECT DISTINCT lower(Subject) AS s FROM learned_material "
+                                "WHERE Subject IS NOT NULL ORDER BY s")["s"].tolist()
+        _vocabulary_versions.clear()
+        _vocabulary_versions[data_version] = hashlib.sha256(
+            json.dumps([columns, subjects]).encode("utf-8")).hexdigest()[:16]
+    return _vocabulary_versions[data_version]
+
+
+_query_caches = {}
+
+
+def get_query_cache(path=DEFAULT_QUERY_CACHE_PATH):
+    """Return the shared QueryCache for a cache file."""
+    key = os.path.abspath(path)
+    if key not in _query_caches:
+        _query_caches[key] = QueryCache(path)
+    return _query_caches[key]
@@ -0,0 +1,131 @@
+"""
+query_context.py
+================
+Compact description of the learned material for the AI text-to-SQL prompt.
+
+The prompt used to contain every distinct (subject, topic, date) row, so it
+grew with every day of learning. The context built here is a profile of the
+data that stays within a token budget:
+
+    Entries: 412 from 2025-04-21 to 2026-10-17 (380 days with material)
+    Subjects (entries, last entry): topics, most recent first
+    - Python (120, 2026-10-17): Decorators; List Comprehensions; Generators; ... (+85 more)
+    - History (40, 2026-09-30): WW2 Pacific; Roman Empire; ... (+31 more)
+
+Every subject is listed (as long as the budget allows) and the remaining
+budget is shared out between the subjects, one topic at a time, so each
+subject gets its most recent topics. The result is cached per data version of
+the query engine.
+"""
+
+import math
+from datetime import date
+
+# Default size of the context in tokens (about four characters per token)
+DEFAULT_TOKEN_BUDGET = 1500
+
+SUBJECTS_SQL = """
+    SELECT Subject, COUNT(*) AS entries, MAX(Date) AS last_date
+    FROM learned_material
+    WHERE Subject IS NOT NULL
+    GROUP BY Subject
+    ORDER BY entries DESC, last_date DESC
+"""
+TOPICS_SQL = """
+    SELECT Subject, Topic, MAX(Date) AS last_date, COUNT(*) AS entries
+    FROM learned_material
+    WHERE Subject IS NOT NULL AND Topic IS NOT NULL
+    GROUP BY Subject, Topic
+    ORDER BY last_date DESC, entries DESC
+"""
+DATES_SQL = """
+    SELECT COUNT(*) AS entries, MIN(Date) AS first_date, MAX(Date) AS last_date, COUNT(DISTINCT Date) AS days
+    FROM learned_material
+    WHERE Subject IS NOT NULL
+"""
+
+# (data version, today, budget) -> context
+_context_cache = {}
+
+
+def estimate_tokens(text):
+    """Rough token count of a text (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+def _format_date(value):
+    return value.strftime("%Y-%m-%d") if hasattr(value, "strftime") else str(value)
+
+
+def build_context(engine=None, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Return the profile of the learned material for the text-to-SQL prompt.
+
+    Args:
+        engine (QueryEngine): Engine to read the data from (the shared engine by default)
+        token_budget (int): Maximum size of the context in (estimated) tokens
+
+    Returns:
+        str: The context, at most token_budget tokens long
+    """
+    if engine is None:
+        from duck_database_runner import get_engine
+        engine = get_engine()
+    # the view only shows entries up to today, so the day is part of the key as well
+    key = (engine.data_version(), date.today(), token_budget)
+    if key not in _context_cache:
+        _context_cache.clear()
+        _context_cache[key] = _build(engine, token_budget)
+    return _context_cache[key]
+
+
+def _build(engine, token_budget):
+    dates = engine.query(DATES_SQL).iloc[0]
+    if not dates["entries"]:
+        return "No material has been saved yet."
+    subjects = engine.query(SUBJECTS_SQL)
+    topics = engine.query(TOPICS_SQL)
+    topics_by_subject = {subject: group["Topic"].tolist() for subject, group in topics.groupby("Subject", sort=False)}
+
+    header = (f"Entries: {dates['entries']} from {_format_date(dates['first_date'])} to "
+              f"{_format_date(dates['last_date'])} ({dates['days']} days with material)\n"
+              f"Subjects (entries, last entry): topics, most recent first")
+    used = estimate_tokens(header)
+
+    # every subject first, with room reserved for a "+N more subjects" line
+    lines = []
+    reserve = estimate_tokens("\n- ... (+10000 more subjects)")
+    for row in subjects.itertuples(index=False):
+        line = {"prefix": f"- {row.Subject} ({row.entries}, {_format_date(row.last_date)})",
+                "topics": [], "available": topics_by_subject.get(row.Subject, [])}
+        cost = estimate_tokens("\n" + line["prefix"] + ": ... (+10000 more)")
+        if used + cost + reserve > token_budget:
+            break
+        used += cost
+        lines.append(line)
+
+    # then one more topic per subject per round until the budget is used up
+    added = True
+    while added:
+        added = False
+        for line in lines:
+            if len(line["topics"]) < len(line["available"]):
+                topic = line["available"][len(line["topics"])]
+                cost = estimate_tokens(topic + "; ")
+                if used + cost <= token_budget:
+                    line["topics"].append(topic)
+                    used += cost
+                    added = True
+
+    rendered = [header]
+    for line in lines:
+        text = line["prefix"]
+        if line["topics"]:
+            text += ": " + "; ".join(line["topics"])
+        hidden = len(line["available"]) - len(line["topics"])
+        if hidden:
+            text += f"; ... (+{hidden} more)" if line["topics"] else f": ... ({hidden} topics)"
+        rendered.append(text)
+    if len(lines) < len(subjects):
+        rendered.append(f"- ... (+{len(subjects) - len(lines)} more subjects)")
+    return "\n".join(rendered)
@@ -3,45 +3,48 @@ import pandas as pd
 import time
 import os
 from IPython.display import Markdown, display, clear_output
+from duck_database_runner import QueryError, get_engine
 
-def run_query(sql_query, display_output=True):
+def run_query(sql_query, display_output=True, use_subprocess=False):
     """
-    Simple function to run a SQL query using duck_database_runner.py
+    Simple function to run a SQL query against the learned_material view
     
     Args:
         sql_query (str): The SQL query to execute
         
         display_output (bool): Whether to display the output in a scrollable HTML table. Default is True.
+        
+        use_subprocess (bool): Run the query in a separate process through duck_database_runner.py and the
+            sql_query.sql / query_output.csv / sql_error_message.txt files instead of the in-process engine.
+            Default is False.
+    
+    Returns:
+        pd.DataFrame: The query results, or None if the query failed (the error is displayed)
     """
     
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    # Write the query to the SQL file
-    with open(os.path.join(BASE_DIR, "sql_query.sql"), "w") as f:
-        f.write(sql_query)
 
     # default is to display output. The ai function which uses context data to generate queries uses this function without displaying output
     # as its not necessary to show the user the context data. 
     print("Running query...")
     
     try:
-        # must use subprocess as the notebook environment may not support direct execution
-        # of the script due to environment constraints
-        subprocess.run(['python', os.path.join(BASE_DIR, 'duck_database_runner.py')],
-                       check=True, capture_output=True)
+        if use_subprocess:
+            df = _run_query_subprocess(sql_query, BASE_DIR)
+        else:
+            # run the query on the long-lived in-process DuckDB connection
+            df = get_engine().query(sql_query)
         
-        # If display_output is False (for ai function), just return after CSV is written
+        # If display_output is False (for ai function), just return the results
         if not display_output:  
             clear_output(wait=True) 
             # need to print something to clear the "Running query..." message
             print('  ')# Clear the "Running query..." message
-            return
+            return df
         
         # Clear the "Running query..." message and display results
         clear_output(wait=True)
         
-        # Read the CSV and display as a nice HTML table with scrolling
-        df = pd.read_csv(os.path.join(BASE_DIR, 'query_output.csv'))
-
         # Create scrollable HTML table
         html_table = df.to_html(escape=False, table_id="query_results")
         
@@ -82,9 +85,26 @@ def run_query(sql_query, display_output=True):
         
         from IPython.display import HTML
         display(HTML(scrollable_html))
+        return df
         
+    except QueryError as e:
+        clear_output(wait=True)
+        display(Markdown(str(e)))
     except subprocess.CalledProcessError as e:
         clear_output(wait=True)
         with open(os.path.join(BASE_DIR, 'sql_error_message.txt'), 'r') as f:    
             error = f.read()
             display(Markdown(error))
+
+
+def _run_query_subprocess(sql_query, base_dir):
+    """Run the query through duck_database_runner.py in a new process and read the results back from the CSV file."""
+    # Write the query to the SQL file
+    with open(os.path.join(base_dir, "sql_query.sql"), "w") as f:
+        f.write(sql_query)
+
+    # the notebook environment may not support direct execution of the script due to environment constraints,
+    # in which case the query can be run in a separate process
+    subprocess.run(['python', os.path.join(base_dir, 'duck_database_runner.py')],
+                   check=True, capture_output=True)
+    return pd.read_csv(os.path.join(base_dir, 'query_output.csv'))
@@ -0,0 +1,135 @@
+"""
+review_renderer.py
+==================
+Builds the daily review page from the sidecars of the review items.
+
+Each item's part of the page (header block plus content section) is rendered
+from its sidecar, which already holds the content section, so no HTML file is
+parsed. The material of a day shows up again in later review pages, so the
+rendered fragments are kept for the session and reused as long as the
+sidecar's stat and the header values are unchanged. The page inlines the
+stylesheet (so review files stay self-contained) and is written to disk with a
+single write.
+"""
+
+import os
+from urllib.parse import quote
+
+# Header block shown above each review item
+ITEM_HEADER = """
+                           <ul style="padding-inline-start: 0px;">
+                                <li style="background-color: #a9b2a9; width: 100%"><strong>&nbsp;Date:&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;<em style="color: white">&nbsp;{date}&nbsp;</em></strong></li>
+                                <li style="background-color: #a9b2a9; width: 100%"><strong>&nbsp;Subject:<em style="color: white">&nbsp;{subject}&nbsp;</em></strong></li>
+                                <li style="background-color: #a9b2a9; width: 100%"><strong>&nbsp;Topic:&nbsp;&nbsp;&nbsp;&nbsp;<em style="color: white">&nbsp;{topic}&nbsp;</em></strong></li>
+                            </ul>
+                           """
+
+# fragments rendered in this session:
+# (review folder, single file) -> (sidecar stat, date, subject, topic, fragment)
+_fragment_cache = {}
+
+
+def has_material(file_path):
+    """Return True if a schedule row holds saved material (empty days have NaN as FilePath)."""
+    return len(str(file_path)) > 4
+
+
+class ReviewRenderer:
+    """
+    Renders review pages from the sidecars of the single files.
+
+    Attributes:
+        sidecars (SidecarStore): Sidecars of the single files
+        assets (AssetStore): Asset store the images are referenced from
+        review_files_path (str): Folder the review pages are saved in
+        styles (str): Path to the CSS file
+        link_css (bool): Link the stylesheet instead of inlining it in every page (smaller pages,
+                         but they only keep their styling next to the Styles folder)
+    """
+
+    def __init__(self, sidecars, assets, review_files_path, styles, link_css=False):
+        self.sidecars = sidecars
+        self.assets = assets
+        self.review_files_path = review_files_path
+        self.styles = styles
+        self.link_css = link_css
+        self._css = None
+
+    def _stylesheet(self):
+        """Return the cached <style> (or <link>) element for the page head."""
+        if self.link_css:
+            try:
+                href = quote(os.path.relpath(self.styles, self.review_files_path).replace("\\", "/"))
+                return f'<link rel="stylesheet" href="{href}">'
+            except ValueError:
+                # on Windows there is no relative path between two drives, the CSS is inlined instead
+                pass
+        mtime = os.path.getmtime(self.styles)
+        if self._css is None or self._css[0] != mtime:
+            with open(self.styles, "r") as style:
+                self._css = (mtime, style.read())
+        return f"<style>{self._css[1]}</style>"
+
+    def fragment(self, item):
+        """
+        Return the rendered fragment of one review item, reusing the one of this session if the item did not change.
+
+        Args:
+            item (ReviewItem): The review item (date, file_path, subject, topic)
+
+        Returns:
+            str: The header block followed by the item's content section
+        """
+        if not has_material(item.file_path):
+            return f"<h2>No material to review for {item.date}.</h2>"
+
+        # the sidecar's stat is enough to tell that the item did not change
+        sidecar_path = self.sidecars.path_for(item.file_path)
+        sidecar = None
+        if not os.path.exists(sidecar_path):
+            # creates the sidecar of a legacy file
+            sidecar = self.sidecars.load(item.file_path)
+        stat = os.stat(sidecar_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        key = (os.path.abspath(self.review_files_path), item.file_path)
+        cached = _fragment_cache.get(key)
+        if cached is not None and cached[:4] == (signature, item.date, item.subject, item.topic):
+            return cached[4]
+
+        section = (sidecar or self.sidecars.load(item.file_path))["section_html"]
+        # image paths are relative to the single files folder, point them to the asset store from the review folder
+        # and show the thumbnails (the full size image opens on click)
+        fragment = (ITEM_HEADER.format(date=item.date, subject=item.subject, topic=item.topic)
+                    + self.assets.relink(section, self.review_files_path, use_thumbnails=True))
+        _fragment_cache[key] = (signature, item.date, item.subject, item.topic, fragment)
+        return fragment
+
+    def render(self, title, items):
+        """
+        Return the complete review page.
+
+        Args:
+            title (str): The review date (YYYY-MM-DD), used as title of the page
+            items (list): The ReviewItems due for review
+
+        Returns:
+            str: The HTML document
+        """
+        parts = [f"""<!DOCTYPE html>
+<html lang='en'><head>
+<meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title}_review</title>
+{self._stylesheet()}</head>
+<body>
+<section>
+<header><h1>{title} Review Material</h1></header><br>"""]
+        parts.extend(self.fragment(item) for item in items)
+        parts.append("</section></body></html>")
+        return "".join(parts)
+
+    def write(self, review_file, title, items):
+        """Render the review page and save it to review_file with one write."""
+        page = self.render(title, items)
+        with open(review_file, "w", encoding="utf-8") as f:
+            f.write(page)
+        return review_file
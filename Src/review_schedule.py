@@ -0,0 +1,139 @@
+"""
+review_schedule.py
+==================
+Precomputed spaced repetition schedule.
+
+ReviewScheduleIndex maps every day of the program (as an offset from the first
+day) to the material due for review on that day, so looking up a day, or every
+day between two dates, does not re-parse dates or walk the intervals again.
+The index is built once per version of the data store and shared by every
+SpacedMemoryReview instance in the session.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+import pandas as pd
+
+# List of time intervals in days
+INTERVALS = [1, 7, 30, 90, 365, 730, 1095, 1460, 1825, 2190, 2555, 2920, 3285]
+
+
+@dataclass(frozen=True)
+class ReviewItem:
+    """One row of the learning history that is due for review (FilePath, Subject and Topic are NaN for skipped days)."""
+    date: str
+    file_path: object
+    subject: object
+    topic: object
+
+
+@dataclass
+class ReviewDay:
+    """The material due for review on one day: the day's own material followed by the material from each interval."""
+    day: date
+    items: list = field(default_factory=list)
+
+    @property
+    def files(self):
+        return [item.file_path for item in self.items]
+
+    @property
+    def dates(self):
+        return [item.date for item in self.items]
+
+    @property
+    def subjects(self):
+        return [item.subject for item in self.items]
+
+    @property
+    def topics(self):
+        return [item.topic for item in self.items]
+
+
+class ReviewScheduleIndex:
+    """
+    Index of the review schedule built from the learned_material DataFrame.
+
+    Attributes:
+        start_date (date): First day of the program (offset 0)
+        last_offset (int): Offset of the last day of the program
+        due (dict): Maps each day offset to the tuple of ReviewItems due on that day
+    """
+
+    def __init__(self, df, intervals=INTERVALS):
+        days = pd.to_datetime(df['Date'], format="%m/%d/%Y").dt.date
+        self.start_date = days.iloc[0]
+
+        # group the rows by their day offset (a day can hold more than one row)
+        rows_by_offset = {}
+        for day, row in zip(days, df[['Date', 'FilePath', 'Subject', 'Topic']].itertuples(index=False)):
+            offset = (day - self.start_date).days
+            rows_by_offset.setdefault(offset, []).append(ReviewItem(*row))
+        self.last_offset = max(rows_by_offset)
+
+        # today's material first, then the material from each interval (only if it exists, not before the start date)
+        self.due = {}
+        for offset in range(self.last_offset + 1):
+            items = list(rows_by_offset.get(offset, []))
+            for days_back in intervals:
+                items.extend(rows_by_offset.get(offset - days_back, []))
+            self.due[offset] = tuple(items)
+
+    def due_on(self, day):
+        """
+        Return the material due for review on a given day.
+
+        Args:
+            day (date | datetime): The day to look up
+
+        Returns:
+            ReviewDay: The due material, or None if the day is outside the program
+        """
+        if isinstance(day, datetime):
+            day = day.date()
+        offset = (day - self.start_date).days
+        if offset not in self.due:
+            return None
+        return ReviewDay(day, list(self.due[offset]))
+
+    def due_between(self, start, end):
+        """
+        Return the material due for review on every day from start to end (both included).
+
+        Args:
+            start (date | datetime): First day of the range
+            end (date | datetime): Last day of the range
+
+        Returns:
+            list: ReviewDay for each day of the range that is part of the program
+        """
+        if isinstance(start, datetime):
+            start = start.date()
+        if isinstance(end, datetime):
+            end = end.date()
+        days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        return [review for review in map(self.due_on, days) if review is not None]
+
+
+# one index per data store, rebuilt only when the store's version changes
+_index_cache = {}
+
+
+def get_review_schedule(store):
+    """
+    Return the ReviewScheduleIndex for a LearnedMaterialStore, building it only if the data changed.
+
+    Args:
+        store (LearnedMaterialStore): The data store holding the learned_material table
+
+    Returns:
+        ReviewScheduleIndex: The index for the current version of the store
+    """
+    # entries still waiting in the log change the data, fold them in before reading the version
+    store.compact()
+    version = store.version()
+    cached = _index_cache.get(store.db_path)
+    if cached is None or cached[0] != version:
+        cached = (version, ReviewScheduleIndex(store.load_dataframe()))
+        _index_cache[store.db_path] = cached
+    return cached[1]
@@ -0,0 +1,90 @@
+"""
+screenshot_index.py
+===================
+Fast lookup of the newest screenshots in the screenshot folder.
+
+OS screenshot folders often hold thousands of files. Instead of listing the
+folder and sorting every entry by os.path.getmtime on each save, the scanner
+reads the folder in a single os.scandir pass (which gets the modification time
+with the directory listing on Windows), keeps only image files, and reuses the
+result until the folder changes. A watermark stored on disk remembers the last
+screenshot that was saved, so "every screenshot since the last save" can be
+picked as well.
+"""
+
+import heapq
+import json
+import os
+
+# File types that are treated as screenshots
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tif", ".tiff", ".heic"}
+
+
+class ScreenshotScanner:
+    """
+    Index of the image files in a screenshot folder.
+
+    Attributes:
+        folder (str): The screenshot folder
+        watermark_file (str): JSON file storing the modification time of the last saved screenshot (optional)
+    """
+
+    def __init__(self, folder, watermark_file=None):
+        self.folder = folder
+        self.watermark_file = watermark_file
+        # (folder modification time, [(file modification time, path), ...])
+        self._cache = None
+
+    def _entries(self):
+        """Return (mtime, path) of every image in the folder, rescanning only if the folder changed."""
+        folder_mtime = os.stat(self.folder).st_mtime_ns
+        if self._cache is None or self._cache[0] != folder_mtime:
+            entries = []
+            with os.scandir(self.folder) as scan:
+                for entry in scan:
+                    if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS and entry.is_file():
+                        entries.append((entry.stat().st_mtime, entry.path.replace("\\", "/")))
+            self._cache = (folder_mtime, entries)
+        return self._cache[1]
+
+    def newest(self, n=1):
+        """
+        Return the paths of the n most recently modified images, newest first.
+
+        Raises:
+            FileNotFoundError: If the folder contains no images
+        """
+        newest = heapq.nlargest(n, self._entries())
+        if not newest:
+            raise FileNotFoundError(f"No screenshots found in {self.folder}")
+        return [path for _, path in newest]
+
+    def watermark(self):
+        """Return the modification time of the last saved screenshot (0 if nothing was saved yet)."""
+        if self.watermark_file and os.path.exists(self.watermark_file):
+            with open(self.watermark_file, "r") as f:
+                return json.load(f).get("last_saved_mtime", 0)
+        return 0
+
+    def since_last_save(self):
+        """Return the paths of the images added after the last saved screenshot, oldest first."""
+        watermark = self.watermark()
+        return [path for mtime, path in sorted(self._entries()) if mtime > watermark]
+
+    def mark_saved(self, path):
+        """Move the watermark to the given screenshot so since_last_save only returns newer ones."""
+        if self.watermark_file:
+            with open(self.watermark_file, "w") as f:
+                json.dump({"last_saved_mtime": os.path.getmtime(path), "last_saved_path": path}, f)
+
+
+# one scanner per folder so the cached listing is shared by every SpacedMemoryReview instance in the session
+_scanners = {}
+
+
+def get_scanner(folder, watermark_file=None):
+    """Return the shared ScreenshotScanner for a folder."""
+    key = (os.path.abspath(folder), watermark_file)
+    if key not in _scanners:
+        _scanners[key] = ScreenshotScanner(folder, watermark_file)
+    return _scanners[key]
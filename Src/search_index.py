@@ -0,0 +1,318 @@
+"""
+search_index.py
+===============
+Local BM25 search over the content of the single files.
+
+Every sidecar (see material_sidecar.py) is indexed by the words of its plain
+text, subject and topic (subject and topic words count SUBJECT_WEIGHT times),
+so material can be found by what it says and not only by how it was labelled.
+Results are ranked with BM25, the usual lexical relevance formula: rare words
+count more than common ones, repeated words count with diminishing returns
+and long texts do not win just by being long.
+
+The index lives in Data/Cache/search_index.sqlite (documents and term
+frequencies as rows). It is updated when an item is saved (add writes only
+the rows of that item) and brought up to date with the sidecar folder before
+a search (sync only re-reads sidecars whose file changed), so it never has to
+be rebuilt or rewritten as a whole.
+"""
+
+import html
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+# BM25 parameters (the common defaults)
+K1 = 1.5
+B = 0.75
+# Words of the subject and topic count as if they appeared this many times in the text
+SUBJECT_WEIGHT = 3
+
+STOPWORDS = {
+    "a", "about", "all", "also", "an", "and", "any", "are", "as", "at", "be", "been", "but", "by", "can", "could",
+    "did", "do", "does", "each", "for", "from", "get", "give", "had", "has", "have", "how", "i", "if", "in", "into",
+    "is", "it", "its", "just", "learn", "learned", "material", "me", "more", "my", "no", "not", "of", "on", "one",
+    "or", "other", "our", "quiz", "show", "so", "some", "such", "summarize", "summary", "than", "that", "the",
+    "their", "them", "then", "there", "these", "they", "this", "those", "to", "up", "use", "used", "was", "we",
+    "were", "what", "when", "where", "which", "while", "who", "why", "will", "with", "would", "you", "your",
+}
+WORD_PATTERN = re.compile(r"[^\W_]+(?:[+#][^\W_]*)*")
+
+
+def tokenize(text):
+    """
+    Return the index terms of a text: lower case words without stopwords, with a plural "s" removed.
+
+    Example:
+        >>> tokenize("Sorting Algorithms in Python")
+        ['sorting', 'algorithm', 'python']
+    """
+    terms = []
+    for word in WORD_PATTERN.findall((text or "").lower()):
+        if word in STOPWORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def snippet(text, terms, width=160, as_html=False):
+    """
+    Return the part of a text around the first occurrence of one of the terms, with the matches in **bold**.
+
+    Args:
+        text (str): The plain text
+        terms (iterable): Index terms (see tokenize) to look for
+        width (int): Approximate length of the snippet in characters
+        as_html (bool): Return escaped HTML with the matches in <mark> (for HTML tables) instead of Markdown
+    """
+    text = re.sub(r"\s+", " ", text or "").strip()
+    terms = [term for term in terms if term]
+    if not terms:
+        return text[:width]
+    pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + r")\w*",
+                         re.I)
+    match = pattern.search(text)
+    start = max(0, match.start() - width // 3) if match else 0
+    if match and start:
+        # start at a word
+        space = text.find(" ", start, match.start())
+        if space != -1:
+            start = space + 1
+    end = min(len(text), start + width)
+    if as_html:
+        part = pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", html.escape(text[start:end]))
+    else:
+        part = pattern.sub(lambda m: f"**{m.group(0)}**", text[start:end])
+    return ("..." if start else "") + part + ("..." if end < len(text) else "")
+
+
+def default_index_path(sidecars_root):
+    """Return the default index file: Data/Cache/search_index.sqlite next to the sidecar folder."""
+    return os.path.join(os.path.dirname(os.path.normpath(sidecars_root)), "Cache", "search_index.sqlite")
+
+
+class SearchIndex:
+    """
+    Persistent BM25 index of the sidecars.
+
+    Items are keyed by the name of their sidecar, which is made from the path of the single file
+    relative to the data folder (see SidecarStore.path_for), so files with the same name in
+    different folders are separate items.
+
+    Attributes:
+        sidecars (SidecarStore): Where the indexed sidecars are stored
+        path (str): SQLite file the index is saved in
+    """
+
+    def __init__(self, sidecars, path=None):
+        self.sidecars = sidecars
+        self.path = path or default_index_path(sidecars.root)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # the index used to be one JSON file rewritten on every save, it is rebuilt from the sidecars
+        legacy_path = os.path.splitext(self.path)[0] + ".json"
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        # one connection shared by the threads of this process, guarded by the lock
+        self._con = sqlite3.connect(self.path, check_same_thread=False)
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                name TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                subject TEXT,
+                topic TEXT,
+                date TEXT,
+                mtime REAL NOT NULL,
+                length INTEGER NOT NULL,
+                text TEXT NOT NULL
+            )
+        """)
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                name TEXT NOT NULL,
+                frequency INTEGER NOT NULL,
+                PRIMARY KEY (term, name)
+            ) WITHOUT ROWID
+        """)
+        self._con.execute("CREATE INDEX IF NOT EXISTS postings_name ON postings (name)")
+        self._con.commit()
+        # sidecar name -> {"file", "subject", "topic", "date", "mtime", "length"} (the text stays on disk)
+        self.docs = None
+        # term -> {sidecar name: frequency}
+        self.postings = {}
+        # SQLite counter of the commits made by other connections, see _load
+        self._data_version = None
+
+    def _load(self):
+        # another instance (or process) sharing the index file committed since the last load:
+        # the items in memory may be outdated, read them again
+        data_version = self._con.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self.docs = None
+        if self.docs is None:
+            self.docs = {name: {"file": file, "subject": subject, "topic": topic, "date": date, "mtime": mtime,
+                                "length": length}
+                         for name, file, subject, topic, date, mtime, length in self._con.execute(
+                             "SELECT name, file, subject, topic, date, mtime, length FROM docs")}
+            self.postings = {}
+            for term, name, frequency in self._con.execute("SELECT term, name, frequency FROM postings"):
+                self.postings.setdefault(term, {})[name] = frequency
+
+    def _remove(self, name):
+        # the rows are deleted even if this instance never loaded the item: another instance
+        # (or process) sharing the index file may have added it since
+        self.docs.pop(name, None)
+        for (term,) in self._con.execute("SELECT term FROM postings WHERE name = ?", [name]).fetchall():
+            postings = self.postings.get(term, {})
+            postings.pop(name, None)
+            if not postings:
+                self.postings.pop(term, None)
+        self._con.execute("DELETE FROM postings WHERE name = ?", [name])
+        self._con.execute("DELETE FROM docs WHERE name = ?", [name])
+
+    def _add(self, name, file, sidecar, mtime):
+        self._remove(name)
+        terms = Counter(tokenize(sidecar.get("plain_text")))
+        for term in tokenize(f"{sidecar.get('subject') or ''} {sidecar.get('topic') or ''}"):
+            terms[term] += SUBJECT_WEIGHT
+        doc = {"file": file, "subject": sidecar.get("subject"), "topic": sidecar.get("topic"),
+               "date": sidecar.get("date"), "mtime": mtime, "length": sum(terms.values())}
+        self.docs[name] = doc
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[name] = frequency
+        self._con.execute("INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          [name, file, doc["subject"], doc["topic"], doc["date"], mtime, doc["length"],
+                           sidecar.get("plain_text") or ""])
+        self._con.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                              [(term, name, frequency) for term, frequency in terms.items()])
+
+    def add(self, file, sidecar):
+        """
+        Index (or re-index) one item, e.g. right after it was saved.
+
+        Only the rows of this item are written, the cost does not grow with the number of items.
+
+        Args:
+            file (str): Path to the single file (the FilePath of the item)
+            sidecar (dict): Its sidecar content (see SidecarStore.write)
+        """
+        path = self.sidecars.path_for(file)
+        with self._lock:
+            self._load()
+            self._add(os.path.basename(path), file, sidecar, os.path.getmtime(path) if os.path.exists(path) else 0)
+            self._con.commit()
+
+    def sync(self, file_paths=()):
+        """
+        Bring the index up to date with the sidecar folder.
+
+        Sidecars that are new or changed since they were indexed are read again, items whose
+        sidecar was removed are dropped. Single files in file_paths that have no sidecar yet
+        (saved before sidecars existed) get one and are indexed as well.
+
+        Args:
+            file_paths (iterable): FilePath values of the saved items
+
+        Returns:
+            int: Number of items that were (re-)indexed or removed
+        """
+        changed = 0
+        with self._lock:
+            self._load()
+            for file in file_paths:
+                if not os.path.exists(self.sidecars.path_for(file)) and os.path.exists(file):
+                    try:
+                        self.sidecars.load(file)
+                    except (OSError, ValueError):
+                        continue
+            seen = set()
+            with os.scandir(self.sidecars.root) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    seen.add(entry.name)
+                    doc = self.docs.get(entry.name)
+                    mtime = entry.stat().st_mtime
+                    if doc is not None and doc["mtime"] == mtime:
+                        continue
+                    try:
+                        with open(entry.path, "r", encoding="utf-8") as f:
+                            sidecar = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    file = sidecar.get("file") or (doc or {}).get("file")
+                    if not file:
+                        continue
+                    self._add(entry.name, file, sidecar, mtime)
+                    changed += 1
+            for name in [name for name in self.docs if name not in seen]:
+                self._remove(name)
+                changed += 1
+            if changed:
+                self._con.commit()
+        return changed
+
+    def contents(self):
+        """
+        Return the indexed items with their text.
+
+        Returns:
+            list: (file, subject, topic, date, text) tuples
+        """
+        with self._lock:
+            return self._con.execute("SELECT file, subject, topic, date, text FROM docs").fetchall()
+
+    def search(self, query, limit=10, min_relative_score=0.0):
+        """
+        Rank the indexed items by their BM25 score for a query.
+
+        Args:
+            query (str): The search words
+            limit (int): Maximum number of results (None for every match)
+            min_relative_score (float): Leave out results scoring less than this share of the best score
+
+        Returns:
+            list: dicts with file, score, subject, topic and date, best match first
+        """
+        with self._lock:
+            self._load()
+            count = len(self.docs)
+            if not count:
+                return []
+            average_length = sum(doc["length"] for doc in self.docs.values()) / count
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log((count - len(postings) + 0.5) / (len(postings) + 0.5) + 1)
+                for name, frequency in postings.items():
+                    length = self.docs[name]["length"]
+                    scores[name] += idf * frequency * (K1 + 1) / (
+                        frequency + K1 * (1 - B + B * length / average_length))
+            ranked = scores.most_common(limit)
+            if not ranked:
+                return []
+            cutoff = ranked[0][1] * min_relative_score
+            return [{"file": self.docs[name]["file"], "score": round(score, 4), "subject": self.docs[name]["subject"],
+                     "topic": self.docs[name]["topic"], "date": self.docs[name]["date"]}
+                    for name, score in ranked if score >= cutoff]
+
+
+_indexes = {}
+
+
+def get_search_index(sidecars):
+    """Return the shared SearchIndex of a sidecar store."""
+    key = os.path.abspath(sidecars.root)
+    if key not in _indexes:
+        _indexes[key] = SearchIndex(sidecars)
+    return _indexes[key]
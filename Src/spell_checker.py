@@ -0,0 +1,247 @@
+"""
+spell_checker.py
+================
+Local spell checking of subjects and topics.
+
+Most subjects and topics repeat, so the words of the existing Subject/Topic
+values (plus a list of common study words and an optional word list file)
+form the vocabulary. Misspelled words are looked up in a SymSpell-style
+deletion index: every vocabulary word is stored under the strings obtained by
+deleting up to MAX_EDIT_DISTANCE characters, so the candidates for a typo are
+found with a few dictionary lookups instead of comparing it to every word.
+
+A small vocabulary cannot tell a typo from a correctly spelled word it does not
+contain ("Tuples" is two edits from "Tables"), so corrections are only made to
+words the user saved before, or to word list words one edit away. The common
+study words only mark words as known, they are never offered as corrections.
+Every other unknown word is reported as unresolved; only those need to be
+checked by the AI.
+"""
+
+import re
+from collections import Counter
+
+# Largest number of edits (insert, delete, substitute, transpose) a correction may need
+MAX_EDIT_DISTANCE = 2
+# Words this short (and abbreviations, numbers) are never corrected
+MIN_WORD_LENGTH = 4
+# Vocabulary words taken from the user's own subjects and topics count this many times more than built-in words
+HISTORY_WEIGHT = 10
+
+# Common words of study subjects, so the first entries of a new user can be checked locally as well
+COMMON_WORDS = """
+introduction history science sciences math mathematics physics chemistry biology programming python java
+javascript typescript data database databases algorithm algorithms structure structures machine learning deep
+neural network networks statistics probability calculus algebra geometry trigonometry linear derivative
+derivatives integral integrals function functions list lists dictionary dictionaries class classes object objects
+oriented loop loops variable variables string strings array arrays economics philosophy psychology literature
+grammar english spanish french german hebrew world ancient modern american european revolution theory regression
+classification clustering decision tree trees random forest forests vector vectors matrix matrices equation
+equations differential quantum mechanics thermodynamics energy force forces motion cell cells genetics evolution
+organic reaction reactions element elements periodic table tables query queries pandas numpy visualization
+analysis recursion sorting search searching binary graph graphs complexity memory review basics advanced
+fundamentals overview concepts concept methods method models model language languages engineering software
+computer computers system systems operating security cryptography web development design patterns testing
+frameworks library libraries files file input output exceptions errors error handling comprehension comprehensions
+generators decorators iterators inheritance polymorphism encapsulation abstraction interfaces modules packages
+syntax semantics logic sets set theory number numbers prime primes fractions percentages ratios proportions
+geography economy government politics civil rights constitution empire kingdom religion culture art music
+anatomy physiology medicine nutrition health ecology environment climate weather astronomy planets stars
+galaxy universe gravity electricity magnetism waves light optics atoms molecules bonds acids bases solutions
+""".split()
+
+# Words made of letters only; words glued to digits (e.g. "WW2", "Python3") are left alone
+WORD_PATTERN = re.compile(r"(?<!\w)[^\W\d_]+(?:'[^\W\d_]+)?(?!\w)")
+
+
+def edit_distance(a, b, limit=MAX_EDIT_DISTANCE):
+    """
+    Return the optimal string alignment distance of a and b (transpositions count as one edit).
+
+    Returns limit + 1 as soon as the distance is known to be larger than limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+def _deletes(word, distance):
+    """Return every string obtained by deleting up to distance characters of word."""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        results |= frontier
+    return results
+
+
+def _match_case(word, like):
+    """Write word with the capitalization of like (words with their own mixed case such as DuckDB are kept)."""
+    if any(c.isupper() for c in word[1:]):
+        return word
+    if like.isupper():
+        return word.upper()
+    if like[:1].isupper():
+        return word[:1].upper() + word[1:]
+    return word
+
+
+class SpellChecker:
+    """
+    Vocabulary with a deletion index for fast fuzzy lookups.
+
+    Attributes:
+        max_edit_distance (int): Largest number of edits of a correction
+    """
+
+    def __init__(self, max_edit_distance=MAX_EDIT_DISTANCE):
+        self.max_edit_distance = max_edit_distance
+        # lower case word -> frequency
+        self.frequency = Counter()
+        # lower case word -> how the word is usually written (e.g. "duckdb" -> "DuckDB")
+        self.spelling = {}
+        # deleted variant -> words it was produced from
+        self.index = {}
+        # words of the saved subjects and topics, corrections may be up to max_edit_distance edits away
+        self.history = set()
+        # words of the word list file, corrections may be one edit away
+        self.dictionary = set()
+
+    def add_word(self, word, count=1):
+        """Add a word to the vocabulary."""
+        key = word.lower()
+        if len(key) < MIN_WORD_LENGTH:
+            return
+        if key not in self.frequency:
+            for variant in _deletes(key, self.max_edit_distance):
+                self.index.setdefault(variant, set()).add(key)
+        self.frequency[key] += count
+        # keep the user's own spelling of mixed case words
+        if key not in self.spelling or any(c.isupper() for c in word[1:]):
+            self.spelling[key] = word
+
+    def add_phrase(self, phrase, count=HISTORY_WEIGHT):
+        """Add every word of a subject or topic to the vocabulary."""
+        for word in WORD_PATTERN.findall(phrase or ""):
+            self.add_word(word, count)
+            if len(word) >= MIN_WORD_LENGTH:
+                self.history.add(word.lower())
+
+    def add_word_list(self, path):
+        """Add the words of a word list file (one word per line, e.g. /usr/share/dict/words)."""
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                word = line.strip()
+                if word.isalpha() and len(word) >= MIN_WORD_LENGTH:
+                    self.add_word(word)
+                    self.dictionary.add(word.lower())
+
+    def known(self, word):
+        return word.lower() in self.frequency
+
+    def suggest(self, word):
+        """
+        Return the best correction of a word, or None if no vocabulary word is close enough.
+
+        Candidates within the edit distance limit (1 for words of up to 5 letters, 2 for longer
+        words) are ranked by distance, then by frequency. Only saved words (history) are used
+        at any distance within the limit, word list words only one edit away, and common study
+        words never. A tie between two equally likely corrections is left unresolved.
+        """
+        key = word.lower()
+        limit = 1 if len(key) <= 5 else self.max_edit_distance
+        candidates = set()
+        for variant in _deletes(key, limit):
+            candidates |= self.index.get(variant, set())
+        ranked = []
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, limit)
+            # a correctly spelled word missing from the vocabulary is usually a couple of edits
+            # away from some vocabulary word, only trust the user's own words that far
+            if candidate in self.history:
+                allowed = limit
+            elif candidate in self.dictionary:
+                allowed = 1
+            else:
+                continue
+            if distance <= allowed:
+                ranked.append((distance, -self.frequency[candidate], candidate))
+        if not ranked:
+            return None
+        ranked.sort()
+        if len(ranked) > 1 and ranked[0][:2] == ranked[1][:2]:
+            return None
+        return _match_case(self.spelling[ranked[0][2]], word)
+
+    def check(self, text):
+        """
+        Correct the misspelled words of a subject or topic.
+
+        Short words, abbreviations (all capitals), and words with digits are left as they are.
+
+        Args:
+            text (str): The subject or topic
+
+        Returns:
+            tuple: (corrected text, list of the words that are unknown and could not be corrected)
+
+        Example:
+            Words the vocabulary does not know are left for the AI instead of being replaced
+            by a similar known word:
+
+            >>> checker = build_spell_checker(["Data Structures"])
+            >>> checker.check("Data Strucures")
+            ('Data Structures', [])
+            >>> checker.check("Stacks and Queues")
+            ('Stacks and Queues', ['Stacks', 'Queues'])
+            >>> checker.check("Tuples, Tries and Series")
+            ('Tuples, Tries and Series', ['Tuples', 'Tries', 'Series'])
+        """
+        unresolved = []
+
+        def fix(match):
+            word = match.group(0)
+            if len(word) < MIN_WORD_LENGTH or word.isupper() or self.known(word):
+                return word
+            suggestion = self.suggest(word)
+            if suggestion is None:
+                unresolved.append(word)
+                return word
+            return suggestion
+
+        corrected = WORD_PATTERN.sub(fix, text)
+        return corrected, unresolved
+
+
+def build_spell_checker(phrases=(), word_list=None):
+    """
+    Create a SpellChecker from the existing subjects and topics.
+
+    Args:
+        phrases (iterable): The Subject and Topic values already saved
+        word_list (str): Optional word list file to add
+
+    Returns:
+        SpellChecker: The checker
+    """
+    checker = SpellChecker()
+    for word in COMMON_WORDS:
+        checker.add_word(word)
+    if word_list:
+        checker.add_word_list(word_list)
+    for phrase in phrases:
+        if isinstance(phrase, str):
+            checker.add_phrase(phrase)
+    return checker
@@ -10,7 +10,8 @@ class StandardQueries:
             5: ("Unique Subjects", self._unique_subjects),
             6: ("Unique Topics", self._unique_topics),
             7: ("Learning Streak", self._learning_streak),
-            8: ("Total Learning Days", self._total_learning_days)
+            8: ("Total Learning Days", self._total_learning_days),
+            9: ("Search Content", self._search_content)
         }
     
     def _all_data(self):
@@ -79,10 +80,25 @@ class StandardQueries:
 
     def _total_learning_days(self):
         return """SELECT 
-        COUNT(*) as total_days_learned
+        COUNT(DISTINCT Date) as total_days_learned
         FROM learned_material 
         WHERE FilePath IS NOT NULL;"""
     
+    def _search_content(self):
+        # ranked full-text search over the saved material (learned_content and the content_score/content_snippet
+        # functions are provided by the query engine, see duck_database_runner.py)
+        words = input("Search the material for: ").strip().replace("'", "''")
+        return f"""SELECT 
+        m.Date, m.Subject, m.Topic,
+        round(content_score(c.FilePath, '{words}'), 3) AS Score,
+        content_snippet(c.Content, '{words}') AS Snippet,
+        m.FilePath
+        FROM learned_content c
+        JOIN learned_material m USING (FilePath)
+        WHERE content_score(c.FilePath, '{words}') > 0
+        ORDER BY Score DESC, m.Date DESC
+        LIMIT 25;"""
+    
     def display_menu(self):
         menu_markdown = "## 📊 Available Queries\n\n"
         
@@ -1,8 +1,9 @@
 """
 visuals.py
 ==========
-All learning-dashboard visuals. Each function loads the CSV independently
-and displays its chart. Call run_all() to render every visual at once.
+All learning-dashboard visuals. Each function loads the data from the DuckDB
+store independently and displays its chart. Call run_all() to render every
+visual at once.
 """
 
 import pandas as pd
@@ -11,15 +12,21 @@ import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 import matplotlib.cm as cm
 import seaborn as sns
+from learned_material_store import LearnedMaterialStore
 
 CSV_PATH = r'C:\Users\Rebecca\OneDrive\Documents\Review\Data\learned_material.csv'
 
 
+def load_data():
+    """Load the learned material from the DuckDB store with Date already parsed to datetimes."""
+    return LearnedMaterialStore(CSV_PATH).load_dataframe(csv_dates=False)
+
+
 # ─────────────────────────────────────────────
 # 1. Entries per Subject (Horizontal Bar Chart)
 # ─────────────────────────────────────────────
 def plot_subject_bar(threshold=2):
-    df = pd.read_csv(CSV_PATH)
+    df = load_data()
     df = df.dropna(subset=['Subject'])
     subject_counts = df['Subject'].value_counts()
     other_count = subject_counts[subject_counts < threshold].sum()
@@ -48,8 +55,7 @@ def plot_subject_bar(threshold=2):
 # 2. Weekly Learning Consistency (Line Chart)
 # ─────────────────────────────────────────────
 def plot_weekly_consistency(goal=4):
-    df = pd.read_csv(CSV_PATH)
-    df['Date'] = pd.to_datetime(df['Date'])
+    df = load_data()
     start_date = df['Date'].min().normalize()
     end_date = pd.Timestamp.today().normalize()
     df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
@@ -96,8 +102,7 @@ def plot_weekly_consistency(goal=4):
 # 3. Gap Analysis (Days Since Last Studied)
 # ─────────────────────────────────────────────
 def plot_gap_analysis(yellow_threshold=150, red_threshold=300):
-    df = pd.read_csv(CSV_PATH)
-    df['Date'] = pd.to_datetime(df['Date'])
+    df = load_data()
     today = pd.Timestamp.today().normalize()
 
     last_studied = df.groupby('Subject')['Date'].max().reset_index()
@@ -133,8 +138,7 @@ def plot_learning_pie(start_date=None, end_date=None):
     """
     start_date / end_date: datetime.date objects (or None to use data min / today).
     """
-    df = pd.read_csv(CSV_PATH)
-    df['Date'] = pd.to_datetime(df['Date'])
+    df = load_data()
 
     data_start = df['Date'].min().normalize()
     data_end   = pd.Timestamp.today().normalize()